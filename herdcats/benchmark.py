@@ -0,0 +1,249 @@
+"""Benchmark simulation throughput, startup time and memory.
+
+Each size is measured in a fresh process so tube data loading and peak
+memory aren't shared between sizes::
+
+    python -m herdcats.benchmark --output before.json
+    python -m herdcats.benchmark --output after.json --compare before.json
+
+Results are written as JSON, one entry per number of owners and cats.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from os import path
+
+from . import events
+from . import generators
+from . import metrics
+from . import network
+from . import randomness
+from . import simulation
+from . import tube
+
+SIZES = (10, 1000, 100000, 1000000)
+TURNS = 20
+METRICS = (
+    'get_total_cats',
+    'get_total_cats_found',
+    'get_average_turns_to_find_cat',
+    'get_most_visited_station',
+    'get_least_lucky_owner',
+)
+
+
+def run(sizes=SIZES, engine='dict', turns=TURNS, seed=0, network_path=None,
+        graphs=None):
+    """Returns the benchmark of each size, each measured in a new process.
+
+    Simulations are on the network in the edge list ``network_path`` if
+    given, rather than the tube map. Given generated networks ``graphs``,
+    such as ``grid:1000``, each size is measured on each of them.
+    """
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'revision': _get_revision(),
+        'engine': engine,
+        'turns': turns,
+        'seed': seed,
+        'network': network_path,
+        'graphs': graphs,
+        'results': [
+            _measure_in_process(
+                number, engine, turns, seed, network_path, graph)
+            for graph in graphs or [None]
+            for number in sizes
+        ],
+    }
+
+
+def measure(number, engine='dict', turns=TURNS, seed=0, network_path=None,
+            graph=None):
+    """Returns measurements of a simulation of ``number`` owners and cats.
+
+    Only the first ``turns`` turns are simulated. Timings are in seconds and
+    peak resident memory in kilobytes.
+    """
+    turn_times = []
+    pair_moves = []
+
+    def on_turn(turn, number_searching):
+        turn_times.append(time.time())
+        pair_moves.append(number_searching)
+
+    start = time.time()
+    if network_path is not None:
+        network.load(network_path)
+    elif graph is not None:
+        generators.load(generators.parse(graph), seed)
+    else:
+        tube.load()
+    loaded = time.time()
+    with events.writing():
+        results, calculator = simulation.simulate(
+            number, engine=engine, rng=randomness.create(seed),
+            max_turns=turns, on_turn=on_turn)
+    measurement = {
+        'number': number,
+        'graph': graph,
+        'load_seconds': loaded - start,
+        'time_to_first_turn_seconds': (
+            turn_times[0] - start if turn_times else None),
+        'turns': len(turn_times),
+        'turns_per_second': None,
+        'pair_moves_per_second': None,
+        'metrics_seconds': _time_metrics(results, calculator),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    # The first turn is left out of the rates as it includes startup
+    if len(turn_times) > 1:
+        seconds = float(turn_times[-1] - turn_times[0])
+        measurement['turns_per_second'] = (len(turn_times) - 1) / seconds
+        measurement['pair_moves_per_second'] = sum(pair_moves[1:]) / seconds
+    return measurement
+
+
+def compare(base, results):
+    """Prints how ``results`` changed from ``base``, as a ratio of each."""
+    base_by_number = dict(
+        ((measurement.get('graph'), measurement['number']), measurement)
+        for measurement in base['results'])
+    for measurement in results['results']:
+        graph = measurement.get('graph')
+        old = base_by_number.get((graph, measurement['number']))
+        if old is None:
+            continue
+        if graph is None:
+            print '%s owners and cats:' % measurement['number']
+        else:
+            print '%s owners and cats on %s:' % (measurement['number'], graph)
+        for key in sorted(measurement):
+            if key == 'metrics_seconds':
+                for name in METRICS:
+                    _print_change(
+                        name, old[key].get(name), measurement[key].get(name))
+            elif key not in ('number', 'graph'):
+                _print_change(key, old.get(key), measurement[key])
+
+
+def main():
+    description = 'Benchmark cat herding simulations.'
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        default=SIZES,
+                        help='Numbers of owners and cats to simulate')
+    parser.add_argument('--engine',
+                        choices=sorted(simulation.ENGINES),
+                        default='dict',
+                        help='Simulation engine')
+    parser.add_argument('--turns',
+                        type=int,
+                        default=TURNS,
+                        help='Number of turns to simulate')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Seed for random choices')
+    parser.add_argument('--network',
+                        help='Simulate on the network in the edge list '
+                             'NETWORK rather than the tube map')
+    parser.add_argument('--generate',
+                        nargs='+',
+                        metavar='KIND:STATIONS',
+                        help='Measure each size on each generated network, '
+                             'where KIND is one of %s' % ', '.join(
+                                 sorted(generators.KINDS)))
+    parser.add_argument('--output',
+                        help='Write the results to OUTPUT rather than stdout')
+    parser.add_argument('--compare',
+                        metavar='BASE',
+                        help='Print the changes from results saved in BASE')
+    # Used to measure each size in its own process
+    parser.add_argument('--measure',
+                        type=int,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--graph',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    for graph in args.generate or ():
+        try:
+            generators.parse(graph)
+        except ValueError:
+            parser.error('Unknown generated network %s' % graph)
+    if args.measure is not None:
+        measurement = measure(
+            args.measure, args.engine, args.turns, args.seed, args.network,
+            args.graph)
+        print json.dumps(measurement)
+        return
+    results = run(
+        args.sizes, args.engine, args.turns, args.seed, args.network,
+        args.generate)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print json.dumps(results, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+def _measure_in_process(number, engine, turns, seed, network_path, graph):
+    command = [
+        sys.executable, '-m', 'herdcats.benchmark',
+        '--measure', str(number), '--engine', engine,
+        '--turns', str(turns), '--seed', str(seed),
+    ]
+    if network_path is not None:
+        command.extend(['--network', network_path])
+    if graph is not None:
+        command.extend(['--graph', graph])
+    output = subprocess.check_output(command)
+    # Found cats are reported as the simulation runs, the measurement last
+    return json.loads(output.splitlines()[-1])
+
+
+def _time_metrics(results, calculator):
+    """Returns the seconds each metric takes to work out."""
+    if calculator is not metrics:
+        return {}
+    seconds = {}
+    for name in METRICS:
+        if (name == 'get_average_turns_to_find_cat' and
+                not metrics.get_total_cats_found(results)):
+            continue
+        start = time.time()
+        getattr(metrics, name)(results)
+        seconds[name] = time.time() - start
+    return seconds
+
+
+def _print_change(name, old, new):
+    if old and new is not None:
+        print '    %s: %.3g -> %.3g (x%.2f)' % (name, old, new, new / old)
+
+
+def _get_revision():
+    """Returns the git revision of the code benchmarked, if known."""
+    with open(os.devnull, 'w') as devnull:
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=path.dirname(path.abspath(__file__)),
+                stderr=devnull).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+if __name__ == '__main__':
+    main()
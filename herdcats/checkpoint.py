@@ -0,0 +1,118 @@
+"""Checkpoints of a simulation, so a long run can carry on from where it
+was stopped.
+
+A checkpoint holds everything the simulation needs to carry on exactly as
+it would have: the owners and cats or their accumulator, the turn, the
+random number stream and which stations are closed. It's written by a
+forked copy of the process, so the simulation doesn't wait for it, to a
+temporary file renamed over the last checkpoint once complete, so a run
+stopped part way through writing one still has the one before.
+"""
+import cPickle as pickle
+import os
+import time
+import traceback
+
+from . import tube
+
+# Seconds between checkpoints
+CHECKPOINT_SECONDS = 60
+VERSION = 1
+
+
+def create(path, seconds=None):
+    """Returns a writer of checkpoints to ``path``, at most one every
+    ``seconds``, ``CHECKPOINT_SECONDS`` if not given."""
+    if seconds is None:
+        seconds = CHECKPOINT_SECONDS
+    return {
+        'path': path,
+        'seconds': seconds,
+        'last': time.time(),
+        'pid': None,
+    }
+
+
+def save(writer, simulation):
+    """Starts writing a checkpoint of the dict ``simulation`` if it's time
+    for the next and the last has been written.
+
+    Returns True if it started.
+    """
+    if (time.time() - writer['last'] < writer['seconds'] or
+            _is_writing(writer)):
+        return False
+    writer['last'] = time.time()
+    if not hasattr(os, 'fork'):
+        _write(writer['path'], simulation)
+        return True
+    pid = os.fork()
+    if pid:
+        writer['pid'] = pid
+        return True
+    # The copy exits straight after writing, without running any of the
+    # simulation's clean up or flushing its output
+    status = 1
+    try:
+        _write(writer['path'], simulation)
+        status = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(status)
+
+
+def finish(writer):
+    """Waits for the checkpoint being written, if any."""
+    if writer['pid'] is not None:
+        __, status = os.waitpid(writer['pid'], 0)
+        _check_written(writer, status)
+
+
+def load(path, options):
+    """Returns the simulation checkpointed in ``path``.
+
+    Raises ValueError if it isn't a checkpoint of a simulation with the
+    same ``options`` on the same network.
+    """
+    with open(path, 'rb') as f:
+        simulation = pickle.load(f)
+    if (simulation.get('version') != VERSION or
+            simulation['options'] != options or
+            simulation['network'] != _get_network()):
+        raise ValueError(
+            'Checkpoint %s is of a different simulation' % path)
+    tube.set_closures(simulation['closures'])
+    return simulation
+
+
+def _is_writing(writer):
+    if writer['pid'] is None:
+        return False
+    pid, status = os.waitpid(writer['pid'], os.WNOHANG)
+    if not pid:
+        return True
+    _check_written(writer, status)
+    return False
+
+
+def _check_written(writer, status):
+    writer['pid'] = None
+    if status:
+        raise IOError('Checkpoint to %s failed' % writer['path'])
+
+
+def _write(path, simulation):
+    checkpoint = dict(
+        simulation, version=VERSION, network=_get_network(),
+        closures=tube.get_closures())
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temporary, path)
+
+
+def _get_network():
+    return (tube.get_number_of_stations(), tube.get_number_of_connections())
@@ -0,0 +1,131 @@
+"""Repeated simulations spread over a pool of processes."""
+import math
+import multiprocessing
+
+from collections import Counter
+
+from . import events
+from . import randomness
+from . import simulation
+from . import tube
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def run(number_of_cats_and_owners, runs, jobs=None, seed=None, **options):
+    """Runs independent simulations and prints a summary across them.
+
+    Runs are spread over ``jobs`` processes, one for each CPU if not given.
+    ``options`` are passed on to ``simulation.simulate``.
+    """
+    summaries = simulate(
+        number_of_cats_and_owners, runs, jobs=jobs, seed=seed, **options)
+    print_summary(summaries)
+
+
+def simulate(number_of_cats_and_owners, runs, jobs=None, seed=None,
+             **options):
+    """Returns a summary of each of ``runs`` independent simulations.
+
+    Each run gets its own random number stream split from ``seed``, so the
+    same seed repeats the same runs whatever the number of ``jobs``.
+    """
+    tasks = [
+        (number_of_cats_and_owners, rng, options)
+        for rng in randomness.spawn(randomness.create(seed), runs)
+    ]
+    if jobs == 1:
+        return map(_simulate, tasks)
+    # Load the tube map before the workers are forked so they share it
+    tube.load()
+    pool = multiprocessing.Pool(jobs, initializer=tube.load)
+    try:
+        return pool.map(_simulate, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def summarise(results, calculator):
+    """Returns the figures of a simulation summary as a dict."""
+    found_cats = calculator.get_total_cats_found(results)
+    return {
+        'total_cats': calculator.get_total_cats(results),
+        'found_cats': found_cats,
+        'unreachable_cats': calculator.get_total_unreachable(results),
+        'average_turns': (
+            calculator.get_average_turns_to_find_cat(results)
+            if found_cats else None),
+        'most_visited_station': calculator.get_most_visited_station(results),
+        'least_lucky_owner': calculator.get_least_lucky_owner(results),
+    }
+
+
+def print_summary(summaries):
+    """Prints the spread of the summaries of many simulations."""
+    print 'Number of runs: %s' % len(summaries)
+    print 'Total number of cats: %s' % summaries[0]['total_cats']
+    _print_spread(
+        'Number of cats found', [s['found_cats'] for s in summaries])
+    unreachable_cats = [s['unreachable_cats'] for s in summaries]
+    if any(unreachable_cats):
+        _print_spread(
+            'Number of owners who can no longer reach their cat',
+            unreachable_cats)
+    average_turns = [
+        s['average_turns'] for s in summaries
+        if s['average_turns'] is not None
+    ]
+    if average_turns:
+        _print_spread(
+            'Average number of movements required to find a cat',
+            average_turns)
+    stations = Counter(
+        s['most_visited_station'] for s in summaries
+        if s['most_visited_station'] is not None)
+    if stations:
+        station, times = stations.most_common(1)[0]
+        print 'The most visited station: %s (%s of %s runs)' % (
+            station, times, len(summaries))
+
+
+def get_mean(values):
+    return float(sum(values)) / len(values)
+
+
+def get_standard_deviation(values):
+    """Returns the sample standard deviation, 0 for a single value."""
+    if len(values) < 2:
+        return 0.0
+    mean = get_mean(values)
+    return math.sqrt(
+        sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+
+def get_quantile(values, quantile):
+    """Returns the quantile of values, interpolating between them."""
+    values = sorted(values)
+    position = quantile * (len(values) - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower)
+
+
+def _print_spread(label, values):
+    print '%s: mean %.2f, std %.2f' % (
+        label, get_mean(values), get_standard_deviation(values))
+    print '    quantiles: %s' % ', '.join(
+        '%d%% %.2f' % (quantile * 100, get_quantile(values, quantile))
+        for quantile in QUANTILES)
+
+
+def _simulate(task):
+    number_of_cats_and_owners, rng, options = task
+    # Every run starts with all stations open
+    tube.reopen_stations()
+    # The cats found during a run aren't reported
+    with events.writing('null'):
+        results, calculator = simulation.simulate(
+            number_of_cats_and_owners, rng=rng, **options)
+    return summarise(results, calculator)
@@ -0,0 +1,134 @@
+"""Reports of cats found during a simulation.
+
+Found cats are reported to the sink in use, if any, as human readable
+text, JSON lines, or not at all. A sink gathers reports into batches for a
+background thread to write, so moving owners and cats never waits on the
+terminal or a pipe. Without a sink, reports are printed straight away.
+"""
+import contextlib
+import json
+import sys
+import threading
+
+from Queue import Queue
+
+from . import tube
+
+FORMATS = ('text', 'json', 'null')
+# Reports gathered before they're handed to the writer
+BATCH_SIZE = 1000
+
+# The sink found cats are reported to
+SINK = None
+
+
+def open_sink(format='text', stream=None):
+    """Returns a sink writing reports in ``format`` to ``stream``, stdout if
+    not given."""
+    if format not in FORMATS:
+        raise ValueError(format)
+    sink = {
+        'format': format,
+        'stream': sys.stdout if stream is None else stream,
+        'batch': [],
+        'queue': Queue(),
+        'error': None,
+        'writer': None,
+    }
+    if format != 'null':
+        sink['writer'] = threading.Thread(target=_write, args=(sink,))
+        sink['writer'].daemon = True
+        sink['writer'].start()
+    return sink
+
+
+def close_sink(sink):
+    """Waits for every report to sink to be written and flushed.
+
+    Raises the error that stopped the writer, if any.
+    """
+    if sink['writer'] is not None:
+        _hand_over(sink)
+        sink['queue'].put(None)
+        sink['writer'].join()
+        sink['writer'] = None
+    if sink['error'] is not None:
+        raise sink['error']
+
+
+@contextlib.contextmanager
+def writing(format='text', stream=None):
+    """Reports found cats to a sink, as for ``open_sink``, inside the
+    ``with`` block, and waits for them to be written at the end of it."""
+    global SINK
+    previous = SINK
+    SINK = open_sink(format, stream)
+    try:
+        yield SINK
+    finally:
+        sink = SINK
+        SINK = previous
+        close_sink(sink)
+
+
+def found_cat(owner_id, station_id):
+    """Reports that owner ``owner_id`` found their cat at ``station_id``."""
+    sink = SINK
+    if sink is None:
+        print format_text(owner_id, station_id)
+    elif sink['writer'] is not None:
+        sink['batch'].append((owner_id, station_id))
+        if len(sink['batch']) >= BATCH_SIZE:
+            _hand_over(sink)
+
+
+def format_text(owner_id, station_id):
+    return (
+        'Owner {owner_id} found cat {owner_id}'
+        ' - {station} station is now closed.').format(
+            owner_id=owner_id,
+            station=tube.get_station_name(station_id)
+    )
+
+
+def format_json(owner_id, station_id):
+    return json.dumps({
+        'event': 'found_cat',
+        'owner': owner_id,
+        'station': station_id,
+        'station_name': tube.get_station_name(station_id),
+    }, sort_keys=True)
+
+
+FORMATTERS = {
+    'text': format_text,
+    'json': format_json,
+}
+
+
+def _hand_over(sink):
+    if sink['batch']:
+        sink['queue'].put(sink['batch'])
+        sink['batch'] = []
+
+
+def _write(sink):
+    formatter = FORMATTERS[sink['format']]
+    stream = sink['stream']
+    while True:
+        batch = sink['queue'].get()
+        if batch is None:
+            break
+        if sink['error'] is not None:
+            # Keep taking batches so closing the sink doesn't wait forever
+            continue
+        try:
+            stream.write(''.join(
+                formatter(owner_id, station_id) + '\n'
+                for owner_id, station_id in batch))
+        except Exception as error:
+            sink['error'] = error
+    try:
+        stream.flush()
+    except Exception as error:
+        sink['error'] = sink['error'] or error
@@ -0,0 +1,162 @@
+"""Generate synthetic networks to test the simulation at scale.
+
+Each generator takes a number of stations and a random number stream and
+returns a graph in the form ``tube`` uses, with station ids from 0. A
+network is given on the command line as ``KIND:STATIONS``, such as
+``grid:10000``.
+"""
+import math
+import time
+
+from array import array
+
+from . import network
+from . import randomness
+
+# Connections of each station of a random regular network
+REGULAR_DEGREE = 4
+# Connections each new station of a scale free network makes
+SCALE_FREE_LINKS = 2
+# A line of a metro-like network stops at another line every so many stops
+INTERCHANGE_SPACING = 8
+
+
+def grid(number, rng):
+    """Returns a square grid of streets, the last row part filled."""
+    side = int(math.ceil(math.sqrt(number)))
+    starts = array('i')
+    ends = array('i')
+    for station in xrange(number):
+        if (station + 1) % side and station + 1 < number:
+            starts.append(station)
+            ends.append(station + 1)
+        if station + side < number:
+            starts.append(station)
+            ends.append(station + side)
+    return _create_graph(number, starts, ends)
+
+
+def ring_of_lines(number, rng):
+    """Returns lines running out from a circle line through their first
+    stations."""
+    lines = max(1, min(number, int(math.sqrt(number) / 2)))
+    starts = array('i')
+    ends = array('i')
+    # Each line's stations are numbered in turn after the first stations
+    station = lines
+    for line in xrange(lines):
+        if lines > 1:
+            starts.append(line)
+            ends.append((line + 1) % lines)
+        previous = line
+        for __ in xrange((number - lines) // lines +
+                         (line < (number - lines) % lines)):
+            starts.append(previous)
+            ends.append(station)
+            previous = station
+            station += 1
+    return _create_graph(number, starts, ends)
+
+
+def random_regular(number, rng, degree=REGULAR_DEGREE):
+    """Returns a network where stations have ``degree`` connections.
+
+    Connections pair up random stations, leaving out the few loops and
+    repeats, so some stations have fewer.
+    """
+    stubs = array('i', xrange(number)) * degree
+    _shuffle(stubs, rng)
+    return _create_graph(number, stubs[0::2], stubs[1::2])
+
+
+def scale_free(number, rng, links=SCALE_FREE_LINKS):
+    """Returns a network grown by preferential attachment.
+
+    Each station connects to ``links`` earlier stations, chosen in
+    proportion to the connections they already have, so a few become hubs.
+    """
+    starts = array('i')
+    ends = array('i')
+    # The first stations are all connected to each other
+    initial = min(number, links + 1)
+    for station in xrange(initial):
+        for other in xrange(station):
+            starts.append(station)
+            ends.append(other)
+    # Each station appears once for each connection, so a uniform choice
+    # of connection end is a choice weighted by connections
+    for station in xrange(initial, number):
+        for __ in xrange(links):
+            other = rng.randbelow(2 * len(starts))
+            starts.append(station)
+            ends.append(starts[other // 2] if other % 2 else ends[other // 2])
+    return _create_graph(number, starts, ends)
+
+
+def metro(number, rng, spacing=INTERCHANGE_SPACING):
+    """Returns a metro-like network of lines meeting at interchanges.
+
+    Lines after the first start at, and every ``spacing`` stops call at, a
+    random station of an earlier line.
+    """
+    lines = max(1, int(math.sqrt(number) / 4))
+    starts = array('i')
+    ends = array('i')
+    station = 0
+    for line in xrange(lines):
+        # Earlier lines' stations are numbered below the line's first
+        first = station
+        previous = rng.randbelow(first) if line else None
+        for stop in xrange(number // lines + (line < number % lines)):
+            if previous is not None:
+                starts.append(previous)
+                ends.append(station)
+            previous = station
+            station += 1
+            if line and not (stop + 1) % spacing:
+                interchange = rng.randbelow(first)
+                starts.append(previous)
+                ends.append(interchange)
+                previous = interchange
+    return _create_graph(number, starts, ends)
+
+
+KINDS = {
+    'grid': grid,
+    'ring': ring_of_lines,
+    'regular': random_regular,
+    'scale-free': scale_free,
+    'metro': metro,
+}
+
+
+def parse(value):
+    """Returns the kind and number of stations of a network from its
+    command line form."""
+    kind, __, number = value.partition(':')
+    if kind not in KINDS or not number.isdigit() or not int(number):
+        raise ValueError(value)
+    return kind, int(number)
+
+
+def load(spec, seed=None):
+    """Generates the network of the kind and number of stations in ``spec``
+    and uses it in place of the tube map.
+
+    Returns a report of its size and how long it took to generate, for
+    ``network.print_report``.
+    """
+    start = time.time()
+    kind, number = spec
+    graph = KINDS[kind](number, randomness.create(seed))
+    return network.use(graph, '%s:%d' % spec, start)
+
+
+def _create_graph(number, starts, ends):
+    return network.from_edges(starts, ends, ids=array('i', xrange(number)))
+
+
+def _shuffle(values, rng):
+    for i in xrange(len(values) - 1, 0, -1):
+        j = rng.randbelow(i + 1)
+        values[i], values[j] = values[j], values[i]
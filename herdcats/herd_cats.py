@@ -2,7 +2,13 @@
 
 import argparse
 
+from . import ensemble
+from . import events
+from . import generators
+from . import instrumentation
+from . import network
 from . import simulation
+from . import trajectory
 
 
 def main():
@@ -14,8 +20,94 @@ def main():
     parser.add_argument('number',
                         type=int,
                         help=help)
+    help = ('Simulation engine: "dict" moves each owner and cat in turn, '
+            '"array" moves them all at once with numpy')
+    parser.add_argument('--engine',
+                        choices=sorted(simulation.ENGINES),
+                        default='dict',
+                        help=help)
+    help = ('Owners only avoid the last VISITED_WINDOW stations they '
+            'visited rather than every station')
+    parser.add_argument('--visited-window',
+                        type=int,
+                        help=help)
+    help = ('Work out the summary as the simulation runs rather than '
+            'from every journey at the end')
+    parser.add_argument('--streaming-metrics',
+                        action='store_true',
+                        help=help)
+    help = ('How much of each journey to keep: "full", "none" or the '
+            'number of most recent stations. Implies --streaming-metrics '
+            'unless "full"')
+    parser.add_argument('--history',
+                        type=trajectory.parse_history,
+                        default=trajectory.FULL,
+                        help=help)
+    help = ('Repeat the simulation RUNS times and summarise the spread of '
+            'the results')
+    parser.add_argument('--runs',
+                        type=int,
+                        help=help)
+    help = 'Number of processes for --runs, one per CPU by default'
+    parser.add_argument('--jobs',
+                        type=int,
+                        help=help)
+    help = 'Seed for random choices, so the same seed repeats a simulation'
+    parser.add_argument('--seed',
+                        type=int,
+                        help=help)
+    help = ('Print counts of what the simulation did and where its time '
+            'went, and save a cProfile dump to PROFILE')
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='herd_cats.prof',
+                        help=help)
+    help = ('Simulate on the network in the edge list NETWORK rather than '
+            'the London underground')
+    parser.add_argument('--network',
+                        help=help)
+    help = 'File of "id,name" lines naming the stations of --network'
+    parser.add_argument('--stations',
+                        help=help)
+    help = ('Simulate on a generated network of KIND:STATIONS, where KIND '
+            'is one of %s' % ', '.join(sorted(generators.KINDS)))
+    parser.add_argument('--generate',
+                        type=generators.parse,
+                        help=help)
+    help = ('How to report the cats found in a simulation: as "text", '
+            'as JSON lines or not at all with "null"')
+    parser.add_argument('--events',
+                        choices=events.FORMATS,
+                        default='text',
+                        help=help)
     args = parser.parse_args()
-    simulation.run(args.number)
+    if args.stations is not None and args.network is None:
+        parser.error('--stations names the stations of --network')
+    if args.network is not None and args.generate is not None:
+        parser.error('--network and --generate both give the network')
+    if args.network is not None:
+        network.print_report(network.load(args.network, args.stations))
+    elif args.generate is not None:
+        network.print_report(generators.load(args.generate, args.seed))
+    options = dict(
+        engine=args.engine,
+        visited_window=args.visited_window,
+        streaming_metrics=args.streaming_metrics,
+        history=args.history,
+    )
+    if args.profile is not None:
+        if args.runs is not None:
+            parser.error('--profile profiles a single simulation, not --runs')
+        instrumentation.profile(
+            args.profile, simulation.run, args.number, seed=args.seed,
+            event_format=args.events, **options)
+    elif args.runs is None:
+        simulation.run(
+            args.number, seed=args.seed, event_format=args.events, **options)
+    else:
+        ensemble.run(
+            args.number, args.runs, jobs=args.jobs, seed=args.seed,
+            **options)
 
 
 if __name__ == '__main__':
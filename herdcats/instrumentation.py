@@ -0,0 +1,180 @@
+"""Counters of where a simulation's time goes.
+
+Counting works by wrapping the functions that move owners and cats, close
+stations, retire owners who can't reach their cat and report found cats
+while ``record`` is in use, so simulations
+run without it are exactly as fast as before.
+"""
+import contextlib
+import cProfile
+import pstats
+import time
+
+from . import events
+from . import players
+from . import tube
+from . import vectorized
+
+PROFILE_LINES = 25
+
+
+def create():
+    """Returns counters for ``record`` to count into."""
+    return {
+        'turn_seconds': [],
+        'active_pairs': [],
+        'moves_attempted': 0,
+        'moves_blocked': 0,
+        'forced_revisits': 0,
+        'stations_closed': 0,
+        'closing_seconds': 0.0,
+        'pairs_retired': 0,
+        'retiring_seconds': 0.0,
+        'reporting_seconds': 0.0,
+    }
+
+
+@contextlib.contextmanager
+def record(counters):
+    """Counts what simulations do inside the ``with`` block in counters.
+
+    ``turn_seconds`` and ``active_pairs`` get the time each turn took and
+    the number of owners searching in it. A move is blocked when an owner
+    or cat is at a closed station, and an owner is forced to revisit a
+    station when all the stations they could move to have been visited.
+    Owners are retired once they can no longer reach their cat, such as
+    when they or their cat are stuck at a closed station.
+    """
+    wrappers = [
+        (players, 'move', _time_turns(counters, players.move)),
+        (vectorized, 'move', _time_turns(counters, vectorized.move)),
+        (tube, 'get_random_connection', _count_connections(
+            counters, tube.get_random_connection)),
+        (vectorized, '_get_random_connections', _count_array_connections(
+            counters, vectorized._get_random_connections)),
+        (tube, 'close_station', _count_closures(
+            counters, tube.close_station)),
+        (players, 'retire_unreachable', _count_retired(
+            counters, players.retire_unreachable)),
+        (vectorized, 'retire_unreachable', _count_retired(
+            counters, vectorized.retire_unreachable)),
+        (events, 'found_cat', _time(
+            counters, 'reporting_seconds', events.found_cat)),
+    ]
+    originals = [
+        (module, name, getattr(module, name))
+        for module, name, __ in wrappers
+    ]
+    for module, name, wrapper in wrappers:
+        setattr(module, name, wrapper)
+    try:
+        yield counters
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+
+def profile(path, func, *args, **kwargs):
+    """Calls func while profiling it, then prints the counters and the
+    functions that took longest and saves the full profile to ``path``."""
+    counters = create()
+    profiler = cProfile.Profile()
+    with record(counters):
+        profiler.runcall(func, *args, **kwargs)
+    print_counters(counters)
+    profiler.dump_stats(path)
+    print 'Profile saved to %s' % path
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(
+        PROFILE_LINES)
+
+
+def print_counters(counters):
+    turn_seconds = counters['turn_seconds']
+    print 'Turns: %s' % len(turn_seconds)
+    if turn_seconds:
+        print 'Seconds per turn: mean %.6f, max %.6f' % (
+            sum(turn_seconds) / len(turn_seconds), max(turn_seconds))
+        active_pairs = counters['active_pairs']
+        print 'Owners searching: %s in first turn, %s in last turn' % (
+            active_pairs[0], active_pairs[-1])
+    print 'Moves attempted: %s' % counters['moves_attempted']
+    print 'Moves blocked by closed stations: %s' % counters['moves_blocked']
+    print 'Owners forced to revisit a station: %s' % (
+        counters['forced_revisits'])
+    print 'Stations closed: %s in %.6f seconds' % (
+        counters['stations_closed'], counters['closing_seconds'])
+    print ('Owners retired as they can no longer reach their cat: %s in '
+           '%.6f seconds') % (
+        counters['pairs_retired'], counters['retiring_seconds'])
+    print 'Seconds reporting found cats: %.6f' % (
+        counters['reporting_seconds'])
+
+
+def _time_turns(counters, move):
+    def timed_move(state, turn, searching=None, *args, **kwargs):
+        if searching is not None:
+            counters['active_pairs'].append(len(searching))
+        start = time.time()
+        still_searching = move(state, turn, searching, *args, **kwargs)
+        counters['turn_seconds'].append(time.time() - start)
+        return still_searching
+    return timed_move
+
+
+def _count_connections(counters, get_random_connection):
+    def counted(from_station, exclude_if_possible=None, **kwargs):
+        connection = get_random_connection(
+            from_station, exclude_if_possible=exclude_if_possible, **kwargs)
+        counters['moves_attempted'] += 1
+        if connection is None:
+            counters['moves_blocked'] += 1
+        elif exclude_if_possible and connection in exclude_if_possible:
+            counters['forced_revisits'] += 1
+        return connection
+    return counted
+
+
+def _count_array_connections(counters, get_random_connections):
+    def counted(state, stations, visited_by=None):
+        next_stations, moved = get_random_connections(
+            state, stations, visited_by=visited_by)
+        counters['moves_attempted'] += len(stations)
+        counters['moves_blocked'] += int((~moved).sum())
+        if visited_by is not None:
+            revisited = vectorized._is_visited(
+                state, visited_by, next_stations[:, None])[:, 0]
+            counters['forced_revisits'] += int((revisited & moved).sum())
+        return next_stations, moved
+    return counted
+
+
+def _count_closures(counters, close_station):
+    def counted(station_id):
+        if not tube.is_closed(station_id):
+            counters['stations_closed'] += 1
+        start = time.time()
+        close_station(station_id)
+        counters['closing_seconds'] += time.time() - start
+    return counted
+
+
+def _count_retired(counters, retire_unreachable):
+    def counted(state, searching, *args, **kwargs):
+        # Searching may be updated in place
+        number_searching = len(searching)
+        start = time.time()
+        still_searching = retire_unreachable(
+            state, searching, *args, **kwargs)
+        counters['retiring_seconds'] += time.time() - start
+        counters['pairs_retired'] += number_searching - len(still_searching)
+        return still_searching
+    return counted
+
+
+def _time(counters, key, func):
+    def timed(*args, **kwargs):
+        start = time.time()
+        result = func(*args, **kwargs)
+        counters[key] += time.time() - start
+        return result
+    return timed
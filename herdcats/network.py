@@ -0,0 +1,209 @@
+"""Load networks other than the tube map from edge lists.
+
+An edge list has a line for each connection with the ids of the two stations
+it connects, separated by a comma or whitespace. Any other columns, a header
+line and lines starting with ``#`` are ignored. Station names can be given in
+a separate file of ``id,name`` lines and default to the station ids.
+
+The edge list is parsed a chunk at a time straight into arrays, so loading
+takes memory in proportion to the number of connections rather than a dict
+for every station. The compiled network is saved next to the edge list, as
+the tube map is, and read back while the files are unchanged.
+"""
+import csv
+import resource
+import time
+
+from array import array
+from itertools import izip
+
+from . import tube
+
+CHUNK_SIZE = 1 << 20
+
+
+def load(connections_path, stations_path=None):
+    """Loads the network in the given files in place of the tube map.
+
+    Returns a report of the size of the network and how long it took to
+    load, for ``print_report``.
+    """
+    start = time.time()
+    data_paths = [connections_path]
+    if stations_path is not None:
+        data_paths.append(stations_path)
+    graph = tube._load_compiled_graph(
+        data_paths, connections_path + '.graph',
+        lambda: build(connections_path, stations_path))
+    return use(graph, connections_path, start)
+
+
+def use(graph, source, start):
+    """Uses graph in place of the tube map.
+
+    Returns a report of its size and the time since ``start`` it took to
+    load from ``source``, for ``print_report``.
+    """
+    tube.set_graph(graph)
+    return {
+        'path': source,
+        'stations': tube.get_number_of_stations(),
+        'connections': tube.get_number_of_connections(),
+        'seconds': time.time() - start,
+        'graph_bytes': get_size(graph),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def build(connections_path, stations_path=None):
+    """Returns the graph of the network in the given files."""
+    with open(connections_path) as f:
+        starts, ends = read_edges(f)
+    station_ids = array('i')
+    names = []
+    if stations_path is not None:
+        with open(stations_path) as f:
+            for row in csv.reader(f):
+                if row and row[0].strip().isdigit():
+                    station_ids.append(int(row[0]))
+                    names.append(row[1])
+    return from_edges(starts, ends, station_ids=station_ids, names=names)
+
+
+def from_edges(starts, ends, ids=None, station_ids=(), names=()):
+    """Returns the graph of stations connected both ways by each start and
+    end station id.
+
+    ``ids`` are all the station ids, sorted, and default to those connected
+    or named. Stations ``station_ids`` have ``names``, the rest are named by
+    their ids.
+    """
+    if ids is None:
+        ids = array(
+            'i', sorted(set(starts) | set(ends) | set(station_ids)))
+    index = tube._index_ids(ids)
+    offsets, neighbors = _get_neighbors(
+        len(ids), array('i', (index[s] for s in starts)),
+        array('i', (index[s] for s in ends)))
+    names = _get_names(ids, station_ids, names)
+    name_offsets = array('i', [0])
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+    return tube._create_graph(
+        ids, offsets, neighbors, ''.join(names), name_offsets, array('i'))
+
+
+def read_edges(f):
+    """Returns arrays of the station ids at the start and end of each
+    connection in the edge list f, leaving out loops."""
+    starts = array('i')
+    ends = array('i')
+    columns = None
+    remainder = ''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        text = remainder + chunk
+        remainder = ''
+        if chunk:
+            # The last line may carry on in the next chunk
+            end = text.rfind('\n') + 1
+            text, remainder = text[:end], text[end:]
+        if '#' in text:
+            text = ''.join(
+                line for line in text.splitlines(True)
+                if not line.lstrip().startswith('#'))
+        if columns is None:
+            text, columns = _skip_header(text)
+        if columns:
+            values = text.replace(',', ' ').split()
+            if len(values) % columns:
+                raise ValueError(
+                    'Edge list lines should have %d columns' % columns)
+            for start, end in izip(map(int, values[0::columns]),
+                                   map(int, values[1::columns])):
+                if start != end:
+                    starts.append(start)
+                    ends.append(end)
+        if not chunk:
+            return starts, ends
+
+
+def get_size(graph):
+    """Returns the number of bytes taken by the arrays of graph."""
+    return sum(
+        len(value) * getattr(value, 'itemsize', 1)
+        for value in graph.values()
+        if isinstance(value, (array, bytearray, str)))
+
+
+def print_report(report):
+    print ('Loaded %s stations and %s connections from %s in %.2f seconds '
+           '(%.1f MB of arrays, peak memory %.1f MB)') % (
+        report['stations'], report['connections'], report['path'],
+        report['seconds'], report['graph_bytes'] / 1e6,
+        report['peak_rss_kb'] / 1e3)
+
+
+def _skip_header(text):
+    """Returns text from its first connection and the number of columns in
+    it, or None if text has no connections yet."""
+    while text:
+        line, __, rest = text.partition('\n')
+        fields = line.replace(',', ' ').split()
+        if fields and all(
+                field.lstrip('-').isdigit() for field in fields[:2]):
+            if len(fields) < 2:
+                raise ValueError('Edge list lines should have two station ids')
+            return text, len(fields)
+        # A header or blank line
+        text = rest
+    return text, None
+
+
+def _get_neighbors(number, starts, ends):
+    """Returns the offsets and neighbours of ``number`` stations connected
+    both ways by each start and end, without repeated connections or
+    stations connected to themselves.
+
+    Connections are counting sorted by station, then each station's block is
+    sorted and has repeats and loops removed.
+    """
+    degree = array('i', [0]) * number
+    for station in starts:
+        degree[station] += 1
+    for station in ends:
+        degree[station] += 1
+    offsets = array('i', [0])
+    for count in degree:
+        offsets.append(offsets[-1] + count)
+    position = offsets[:-1]
+    neighbors = array('i', [0]) * offsets[-1]
+    for start, end in izip(starts, ends):
+        neighbors[position[start]] = end
+        position[start] += 1
+        neighbors[position[end]] = start
+        position[end] += 1
+    unique_offsets = array('i', [0])
+    unique_neighbors = array('i')
+    for station in xrange(number):
+        connected = set(neighbors[offsets[station]:offsets[station + 1]])
+        connected.discard(station)
+        unique_neighbors.extend(sorted(connected))
+        unique_offsets.append(len(unique_neighbors))
+    return unique_offsets, unique_neighbors
+
+
+def _get_names(ids, station_ids, names):
+    """Returns the names of stations ``ids`` in order, given those of
+    ``station_ids``, defaulting to their ids."""
+    named = sorted(xrange(len(station_ids)), key=station_ids.__getitem__)
+    ordered = []
+    i = 0
+    for station_id in ids:
+        while i < len(named) and station_ids[named[i]] < station_id:
+            i += 1
+        if i < len(named) and station_ids[named[i]] == station_id:
+            ordered.append(names[named[i]])
+        else:
+            ordered.append(str(station_id))
+    return ordered
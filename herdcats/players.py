@@ -1,24 +1,97 @@
 """Players (owners and cats)."""
+from collections import deque
+from itertools import izip
+
+from . import events
+from . import randomness
+from . import streaming
+from . import trajectory
 from . import tube
 
 
-def create(number):
-    """Returns list of cats and owners positioned at random stations."""
-    owner_and_cats = []
-    for i in xrange(number):
-        owner_and_cats.append(_create())
-    return owner_and_cats
+def create(number, visited_window=None, history=trajectory.FULL,
+           rng=randomness.DEFAULT):
+    """Returns list of cats and owners positioned at random stations.
+
+    Owners avoid every station they have visited, or only the last
+    ``visited_window`` stations if given. ``history`` is how much of each
+    journey to keep, as for ``trajectory.create``. Stations are chosen with
+    ``rng``.
+    """
+    owner_stations, cat_stations = tube.get_random_station_pairs(number, rng)
+    return [
+        _create(owner_station, cat_station, visited_window, history)
+        for owner_station, cat_station in izip(owner_stations, cat_stations)
+    ]
 
 
-def move(owners_and_cats, turn):
-    """Returns list of owners and cats moved to the next possible station."""
+def move(owners_and_cats, turn, searching=None, accumulator=None,
+         rng=randomness.DEFAULT):
+    """Returns indices of owners still searching after moving to the next
+    possible station.
+
+    Only the owners and cats at the indices in ``searching`` move, or all of
+    them if it isn't given. Owners who find their cat are removed from
+    ``searching`` as it is updated in place. Moves are added to the
+    ``streaming`` accumulator if given. Once stations have closed, owners
+    who can no longer reach their cat are retired as for
+    ``retire_unreachable``. Stations are chosen with ``rng``.
+    """
+    if searching is None:
+        searching = range(len(owners_and_cats))
     # We assume all owners and cats move on at the same time and each journey
     # takes the same time so we don't need to check for cats being found
     # after each individual owner or cat move
-    for i, owner_and_cat in enumerate(owners_and_cats):
-        _attempt_move(owner_and_cat)
-        if _is_cat_found_this_turn(owner_and_cat, turn):
+    still_searching = 0
+    any_found = False
+    for i in searching:
+        owner_and_cat = owners_and_cats[i]
+        _attempt_move(owner_and_cat, rng)
+        is_found = _is_cat_found_this_turn(owner_and_cat, turn)
+        if accumulator is not None:
+            streaming.record(accumulator, i, owner_and_cat, is_found)
+        if is_found:
             _handle_found_cat(owner_and_cat, i)
+            any_found = True
+        else:
+            searching[still_searching] = i
+            still_searching += 1
+    del searching[still_searching:]
+    if any_found:
+        retire_unreachable(owners_and_cats, searching, accumulator)
+    return searching
+
+
+def get_searching(owners_and_cats):
+    """Returns indices of owners who haven't found their cat and may still
+    reach it."""
+    return [
+        i for i, owner_and_cat in enumerate(owners_and_cats)
+        if not (_is_cat_found(owner_and_cat) or
+                owner_and_cat.get('unreachable'))
+    ]
+
+
+def retire_unreachable(owners_and_cats, searching, accumulator=None):
+    """Returns indices of owners in ``searching`` who may still reach their
+    cat.
+
+    The others are marked unreachable, added to the ``streaming``
+    accumulator if given, and removed from ``searching`` as it is updated in
+    place.
+    """
+    still_searching = 0
+    for i in searching:
+        owner_and_cat = owners_and_cats[i]
+        if tube.can_meet(*_get_current_stations(owner_and_cat)):
+            searching[still_searching] = i
+            still_searching += 1
+        else:
+            owner_and_cat['unreachable'] = True
+            if accumulator is not None:
+                streaming.record_unreachable(accumulator)
+    del searching[still_searching:]
+    return searching
 
 
 def are_all_cats_found(owner_and_cats):
@@ -41,39 +114,49 @@ def get_number_of_times_owner_one_hop_away(owner_and_cat):
     )
 
 
-def _create():
-    intial_owner_station = tube.get_random_station()
-    initial_cat_station = tube.get_random_station(
-        exclude=[intial_owner_station])
-    return {
-        'owner': [intial_owner_station],
-        'cat': [initial_cat_station]
+def _create(intial_owner_station, initial_cat_station, visited_window=None,
+            history=trajectory.FULL):
+    owner_and_cat = {
+        'owner': trajectory.create(intial_owner_station, history),
+        'cat': trajectory.create(initial_cat_station, history)
     }
+    if visited_window is None:
+        owner_and_cat['visited'] = set()
+    else:
+        # Count each station in the window so a station only stops being
+        # visited when its last visit drops out of the window
+        owner_and_cat['visited'] = {}
+        owner_and_cat['recent'] = deque(maxlen=visited_window)
+    _mark_visited(owner_and_cat, intial_owner_station)
+    return owner_and_cat
 
 
-def _attempt_move(owner_and_cat):
+def _attempt_move(owner_and_cat, rng=randomness.DEFAULT):
     if _is_cat_found(owner_and_cat):
         return owner_and_cat
     else:
-        _attempt_owner_move(owner_and_cat)
-        _attempt_cat_move(owner_and_cat)
+        _attempt_owner_move(owner_and_cat, rng)
+        _attempt_cat_move(owner_and_cat, rng)
 
 
-def _attempt_owner_move(owner_and_cat):
+def _attempt_owner_move(owner_and_cat, rng=randomness.DEFAULT):
     current_owner_station, __ = _get_current_stations(owner_and_cat)
     visisted_stations = _get_visisted_stations(owner_and_cat)
     next_owner_station = tube.get_random_connection(
         current_owner_station,
-        exclude_if_possible=visisted_stations
+        exclude_if_possible=visisted_stations,
+        rng=rng
     )
     if next_owner_station is not None:
         owner_and_cat['owner'].append(next_owner_station)
+        _mark_visited(owner_and_cat, next_owner_station)
 
 
-def _attempt_cat_move(owner_and_cat):
+def _attempt_cat_move(owner_and_cat, rng=randomness.DEFAULT):
     __, current_cat_station = _get_current_stations(owner_and_cat)
     next_cat_station = tube.get_random_connection(
-        current_cat_station
+        current_cat_station,
+        rng=rng
     )
     if next_cat_station is not None:
         owner_and_cat['cat'].append(next_cat_station)
@@ -88,21 +171,12 @@ def _handle_found_cat(owner_and_cat, owner_id):
     # )
     found_at = _get_current_stations(owner_and_cat)[0]
     tube.close_station(found_at)
-    _print_found_cat(
+    events.found_cat(
         owner_id,
         found_at
     )
 
 
-def _print_found_cat(owner_id, found_at):
-    print (
-        'Owner {owner_id} found cat {owner_id}'
-        ' - {station} station is now closed.').format(
-            owner_id=owner_id,
-            station=tube.get_station_name(found_at)
-    )
-
-
 def _is_cat_found_this_turn(owner_and_cat, turn):
     return (
         _cat_and_owner_moved_this_turn(owner_and_cat, turn) and
@@ -124,4 +198,19 @@ def _get_current_stations(owner_and_cat):
 
 
 def _get_visisted_stations(owner_and_cat):
-    return owner_and_cat['owner']
+    return owner_and_cat['visited']
+
+
+def _mark_visited(owner_and_cat, station):
+    visited = _get_visisted_stations(owner_and_cat)
+    recent = owner_and_cat.get('recent')
+    if recent is None:
+        visited.add(station)
+    elif recent.maxlen:
+        if len(recent) == recent.maxlen:
+            oldest = recent[0]
+            visited[oldest] -= 1
+            if not visited[oldest]:
+                del visited[oldest]
+        recent.append(station)
+        visited[station] = visited.get(station, 0) + 1
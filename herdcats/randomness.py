@@ -0,0 +1,132 @@
+"""Random number streams for simulations.
+
+Each simulation draws from its own stream rather than the global ``random``
+module, so a seed repeats it exactly and simulations running side by side
+don't share state.
+"""
+import hashlib
+import random
+import sys
+
+from array import array
+
+BLOCK_SIZE = 4096
+WORD_LIMIT = 1 << 16
+LONG_WORD_LIMIT = 1 << 32
+
+
+class BlockRandom(random.Random):
+    """A ``random.Random`` that draws choices from blocks of random words.
+
+    ``randbelow`` and ``choice`` take a 16 bit word each from a block drawn
+    with a single ``getrandbits`` call, rejecting the few words that would
+    make some choices more likely than others.
+    """
+
+    def seed(self, *args, **kwargs):
+        super(BlockRandom, self).seed(*args, **kwargs)
+        self._clear_block()
+
+    def getstate(self):
+        """Returns the state of the stream, with its block of words."""
+        return (super(BlockRandom, self).getstate(), self._block.tostring(),
+                self._position)
+
+    def setstate(self, state):
+        base, block, position = state
+        super(BlockRandom, self).setstate(base)
+        self._block = array('H', block)
+        self._position = position
+
+    def randbelow(self, n):
+        """Returns a random int from 0 up to but not including n."""
+        if n > WORD_LIMIT:
+            return self._randbelow(n)
+        # The largest multiple of n below the word limit, so each remainder
+        # is as likely
+        limit = WORD_LIMIT - WORD_LIMIT % n
+        block = self._block
+        position = self._position
+        while True:
+            if position == len(block):
+                block = self._draw_block()
+                position = 0
+            word = block[position]
+            position += 1
+            if word < limit:
+                self._position = position
+                return word % n
+
+    def randbelow_many(self, n, count):
+        """Returns an array of ``count`` random ints from 0 up to but not
+        including n.
+
+        Below the word limit they are the same as ``count`` calls to
+        ``randbelow``. Above it they're drawn from 32 bit words, with a
+        single ``getrandbits`` call for all of them but the few rejected.
+        """
+        if n > WORD_LIMIT:
+            return self._randbelow_many_long(n, count)
+        limit = WORD_LIMIT - WORD_LIMIT % n
+        values = array('i')
+        block = self._block
+        position = self._position
+        while len(values) < count:
+            if position == len(block):
+                block = self._draw_block()
+                position = 0
+            # Rejected words mean taking another slice for those still needed
+            words = block[position:position + count - len(values)]
+            position += len(words)
+            values.extend([word % n for word in words if word < limit])
+        self._position = position
+        return values
+
+    def _randbelow_many_long(self, n, count):
+        limit = LONG_WORD_LIMIT - LONG_WORD_LIMIT % n
+        values = array('i')
+        while len(values) < count:
+            needed = count - len(values)
+            words = array('I', ('%0*x' % (
+                8 * needed, self.getrandbits(32 * needed))).decode('hex'))
+            if sys.byteorder == 'little':
+                words.byteswap()
+            values.extend([word % n for word in words if word < limit])
+        return values
+
+    def choice(self, seq):
+        return seq[self.randbelow(len(seq))]
+
+    def _clear_block(self):
+        self._block = array('H')
+        self._position = 0
+
+    def _draw_block(self):
+        words = '%0*x' % (4 * BLOCK_SIZE, self.getrandbits(16 * BLOCK_SIZE))
+        self._block = array('H', words.decode('hex'))
+        # Words are read the same way on any machine
+        if sys.byteorder == 'little':
+            self._block.byteswap()
+        return self._block
+
+
+def create(seed=None):
+    """Returns a random number stream, seeded from the OS if not given."""
+    return BlockRandom(seed)
+
+
+def spawn(rng, number):
+    """Returns ``number`` independent child streams of ``rng``.
+
+    Each child is seeded by hashing one draw from ``rng`` with its position,
+    so the same parent state always gives the same children.
+    """
+    key = '%032x' % rng.getrandbits(128)
+    return [
+        create(long(hashlib.sha256('%s:%d' % (key, i)).hexdigest(), 16))
+        for i in xrange(number)
+    ]
+
+
+# The stream used when none is given
+DEFAULT = create()
@@ -3,18 +3,27 @@
 from . import metrics
 
 
-def print_summary(owners_and_cats):
-    total_cats = metrics.get_total_cats(owners_and_cats)
-    found_cats = metrics.get_total_cats_found(owners_and_cats)
+def print_summary(results, calculator=metrics):
+    """Prints a summary of the simulation results.
+
+    ``results`` are the owners and cats for the ``metrics`` module, or an
+    accumulator if ``calculator`` is the ``streaming`` module.
+    """
+    total_cats = calculator.get_total_cats(results)
+    found_cats = calculator.get_total_cats_found(results)
     print 'Total number of cats: %s' % total_cats
     print 'Number of cats found: %s' % found_cats
+    unreachable = calculator.get_total_unreachable(results)
+    if unreachable:
+        print ('Number of owners who can no longer reach their cat: %s' %
+               unreachable)
     if found_cats:
-        average_turns = metrics.get_average_turns_to_find_cat(owners_and_cats)
+        average_turns = calculator.get_average_turns_to_find_cat(results)
         print ('Average number of movements required to find a cat: %d' %
                average_turns)
-    most_visited = metrics.get_most_visited_station(owners_and_cats)
+    most_visited = calculator.get_most_visited_station(results)
     print 'The most visited station: %s' % most_visited
-    least_lucky_owner = metrics.get_least_lucky_owner(owners_and_cats)
+    least_lucky_owner = calculator.get_least_lucky_owner(results)
     if least_lucky_owner:
         print (
             'The least lucky owner: %s'
@@ -1,14 +1,124 @@
+from . import checkpoint
+from . import events
+from . import instrumentation
+from . import metrics
 from . import players
+from . import randomness
 from . import reporting
+from . import streaming
+from . import trajectory
+from . import vectorized
 
 MAX_TURNS = 100000
 
+ENGINES = {
+    'dict': players,
+    'array': vectorized,
+}
 
-def run(number_of_cats_and_owners):
-    owners_and_cats = players.create(number_of_cats_and_owners)
-    turn = 0
-    while turn < MAX_TURNS and not players.are_all_cats_found(
-            owners_and_cats):
+
+def run(number_of_cats_and_owners, engine='dict', visited_window=None,
+        streaming_metrics=False, history=trajectory.FULL, seed=None,
+        counters=None, event_format='text', checkpoint_path=None,
+        resume=False):
+    """Runs a simulation and prints a summary of the results.
+
+    With ``streaming_metrics`` the summary is worked out as the simulation
+    runs rather than from the owners' and cats' journeys at the end, which
+    it must be unless the full ``history`` of each journey is kept. The same
+    ``seed`` repeats the same simulation. What the simulation does is
+    counted in ``counters`` from ``instrumentation.create`` if given. Found
+    cats are reported in ``event_format``, one of ``events.FORMATS``, and
+    all written before the summary. ``checkpoint_path`` and ``resume`` are
+    as for ``simulate``.
+    """
+    options = dict(
+        engine=engine, visited_window=visited_window,
+        streaming_metrics=streaming_metrics, history=history,
+        rng=randomness.create(seed), checkpoint_path=checkpoint_path,
+        resume=resume)
+    with events.writing(event_format):
+        if counters is None:
+            results, calculator = simulate(
+                number_of_cats_and_owners, **options)
+        else:
+            with instrumentation.record(counters):
+                results, calculator = simulate(
+                    number_of_cats_and_owners, **options)
+    reporting.print_summary(results, calculator=calculator)
+
+
+def simulate(number_of_cats_and_owners, engine='dict', visited_window=None,
+             streaming_metrics=False, history=trajectory.FULL, rng=None,
+             max_turns=None, on_turn=None, checkpoint_path=None,
+             resume=False):
+    """Runs a simulation and returns the results and the module that works
+    out their summary, as for ``reporting.print_summary``.
+
+    Random choices are drawn from ``rng``, a new unseeded stream if not
+    given. The simulation stops after ``max_turns``, ``MAX_TURNS`` if not
+    given, or once every owner has found their cat or can no longer reach
+    it. ``on_turn`` is called after each turn with the turn and the number
+    of owners and cats who searched in it. Given ``checkpoint_path``, a
+    checkpoint is written to it as for ``checkpoint.save`` after each turn.
+    With ``resume`` the simulation carries on from the checkpoint there,
+    which must be of a simulation with the same options, exactly as that
+    one would have.
+    """
+    if rng is None:
+        rng = randomness.create()
+    if max_turns is None:
+        max_turns = MAX_TURNS
+    options = dict(
+        number_of_cats_and_owners=number_of_cats_and_owners, engine=engine,
+        visited_window=visited_window, streaming_metrics=streaming_metrics,
+        history=history)
+    engine = ENGINES[engine]
+    if resume:
+        saved = checkpoint.load(checkpoint_path, options)
+        owners_and_cats = saved['owners_and_cats']
+        accumulator = saved['accumulator']
+        searching = saved['searching']
+        rng = saved['rng']
+        turn = saved['turn']
+    else:
+        owners_and_cats = engine.create(
+            number_of_cats_and_owners, visited_window=visited_window,
+            history=history, rng=rng)
+        accumulator = None
+        if streaming_metrics or history != trajectory.FULL:
+            accumulator = _create_accumulator(engine, owners_and_cats)
+        # Owners may start where they can never reach their cat
+        searching = engine.retire_unreachable(
+            owners_and_cats, engine.get_searching(owners_and_cats),
+            accumulator)
+        turn = 0
+    writer = None
+    if checkpoint_path is not None:
+        writer = checkpoint.create(checkpoint_path)
+    while turn < max_turns and len(searching):
         turn += 1
-        players.move(owners_and_cats, turn)
-    reporting.print_summary(owners_and_cats)
+        number_searching = len(searching)
+        searching = engine.move(
+            owners_and_cats, turn, searching, accumulator=accumulator,
+            rng=rng)
+        if on_turn is not None:
+            on_turn(turn, number_searching)
+        if writer is not None:
+            checkpoint.save(writer, dict(
+                options=options, owners_and_cats=owners_and_cats,
+                accumulator=accumulator, searching=searching, rng=rng,
+                turn=turn))
+    if writer is not None:
+        checkpoint.finish(writer)
+    if accumulator is not None:
+        return accumulator, streaming
+    if engine is vectorized:
+        owners_and_cats = vectorized.get_owners_and_cats(owners_and_cats)
+    return owners_and_cats, metrics
+
+
+def _create_accumulator(engine, owners_and_cats):
+    if engine is vectorized:
+        return vectorized.create_accumulator(owners_and_cats)
+    return streaming.create(owners_and_cats)
@@ -0,0 +1,115 @@
+"""Metrics accumulated while the simulation runs.
+
+An accumulator keeps running totals of what ``metrics`` works out from the
+owners' and cats' full journeys, so a summary can be reported without
+keeping them. The ``get_*`` functions give the same results as those in
+``metrics`` would for the same owners and cats.
+"""
+from array import array
+from collections import Counter
+
+from . import tube
+
+
+def create(owners_and_cats):
+    """Returns an accumulator of owners' and cats' journeys so far."""
+    number = len(owners_and_cats)
+    accumulator = {
+        'total_cats': number,
+        'total_found': 0,
+        'total_unreachable': 0,
+        'total_turns_to_find': 0,
+        'station_visits': Counter(),
+        'one_hop_counts': array('l', [0]) * number,
+        'owner_lengths': array('l', [0]) * number,
+        'cat_lengths': array('l', [0]) * number,
+    }
+    for i, owner_and_cat in enumerate(owners_and_cats):
+        owner, cat = owner_and_cat['owner'], owner_and_cat['cat']
+        accumulator['station_visits'].update(owner)
+        accumulator['station_visits'].update(cat)
+        accumulator['one_hop_counts'][i] = sum(
+            1 for owner_station, cat_station in zip(owner, cat)
+            if tube.are_connected(owner_station, cat_station)
+        )
+        accumulator['owner_lengths'][i] = len(owner)
+        accumulator['cat_lengths'][i] = len(cat)
+        if owner[-1] == cat[-1]:
+            _record_found(accumulator, len(owner))
+        if owner_and_cat.get('unreachable'):
+            record_unreachable(accumulator)
+    return accumulator
+
+
+def record(accumulator, owner_id, owner_and_cat, is_found=False):
+    """Adds the latest moves of an owner and their cat to ``accumulator``."""
+    owner, cat = owner_and_cat['owner'], owner_and_cat['cat']
+    owner_length, cat_length = len(owner), len(cat)
+    owner_lengths = accumulator['owner_lengths']
+    cat_lengths = accumulator['cat_lengths']
+    station_visits = accumulator['station_visits']
+    owner_moved = owner_length > owner_lengths[owner_id]
+    cat_moved = cat_length > cat_lengths[owner_id]
+    if owner_moved:
+        station_visits[owner[-1]] += 1
+    if cat_moved:
+        station_visits[cat[-1]] += 1
+    # Journeys are compared step by step, so once an owner or cat misses a
+    # move their later stations are never compared
+    if (owner_moved and cat_moved and
+            owner_lengths[owner_id] == cat_lengths[owner_id] and
+            tube.are_connected(owner[-1], cat[-1])):
+        accumulator['one_hop_counts'][owner_id] += 1
+    owner_lengths[owner_id] = owner_length
+    cat_lengths[owner_id] = cat_length
+    if is_found:
+        _record_found(accumulator, owner_length)
+
+
+def record_unreachable(accumulator):
+    """Adds an owner who can no longer reach their cat to ``accumulator``."""
+    accumulator['total_unreachable'] += 1
+
+
+def get_total_cats(accumulator):
+    return accumulator['total_cats']
+
+
+def get_total_cats_found(accumulator):
+    return accumulator['total_found']
+
+
+def get_total_unreachable(accumulator):
+    return accumulator['total_unreachable']
+
+
+def get_average_turns_to_find_cat(accumulator):
+    total_reunited = accumulator['total_found']
+    if not total_reunited:
+        raise ValueError('No cats were found by their owners')
+    return float(accumulator['total_turns_to_find']) / total_reunited
+
+
+def get_most_visited_station(accumulator):
+    """Returns most visited station name, or None if no visits."""
+    station_visits = accumulator['station_visits']
+    if station_visits:
+        return tube.get_station_name(get_most_common(station_visits))
+
+
+def get_least_lucky_owner(accumulator):
+    """Returns owner who was one station away from their cat the most times."""
+    one_hop_counts = accumulator['one_hop_counts']
+    if one_hop_counts:
+        return max(xrange(len(one_hop_counts)),
+                   key=one_hop_counts.__getitem__)
+
+
+def get_most_common(counts):
+    """Returns the key with the highest count, the lowest key on a tie."""
+    return min(counts, key=lambda key: (-counts[key], key))
+
+
+def _record_found(accumulator, owner_length):
+    accumulator['total_found'] += 1
+    accumulator['total_turns_to_find'] += owner_length
@@ -0,0 +1,137 @@
+"""Compact storage for the stations visited by owners and cats."""
+from collections import deque
+
+from . import tube
+
+FULL = 'full'
+NONE = 'none'
+
+
+def create(station, history=FULL):
+    """Returns a journey starting at station.
+
+    ``history`` is how much of the journey to keep: ``'full'``, ``'none'`` or
+    the number of most recent stations.
+    """
+    return Trajectory(station, history)
+
+
+def parse_history(value):
+    """Returns a history setting from its command line form."""
+    if value in (FULL, NONE):
+        return value
+    return int(value)
+
+
+class Trajectory(object):
+    """The stations visited by an owner or cat, in order.
+
+    Behaves like a list of station ids that can only be appended to. ``len``
+    is the length of the whole journey but only the stations kept by its
+    history are iterated over. With full history each move is stored as the
+    position of the next station among the previous station's connections,
+    packed into just enough bits for the best connected station.
+    """
+    __slots__ = ('_start', '_current', '_length', '_bits', '_moves',
+                 '_recent')
+
+    def __init__(self, station, history=FULL):
+        self._start = self._current = station
+        self._length = 1
+        self._bits = 0
+        self._moves = self._recent = None
+        if history == FULL:
+            self._bits = (tube.get_max_connections() - 1).bit_length()
+            self._moves = bytearray()
+        elif history != NONE:
+            self._recent = deque([station], maxlen=history)
+
+    def append(self, station):
+        if self._moves is not None:
+            self._pack(tube.get_connection_index(self._current, station))
+        elif self._recent is not None:
+            self._recent.append(station)
+        self._current = station
+        self._length += 1
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._moves is not None:
+            yield self._start
+            for station in tube.follow_connections(
+                    self._start, self._unpack()):
+                yield station
+        elif self._recent is not None:
+            for station in self._recent:
+                yield station
+        else:
+            yield self._current
+
+    def __getitem__(self, index):
+        if index in (-1, self._length - 1):
+            return self._current
+        stations = list(self)
+        if index < 0:
+            index += self._length
+        # Only the end of the journey may have been kept
+        index -= self._length - len(stations)
+        if not 0 <= index < len(stations):
+            raise IndexError('Station not kept in history')
+        return stations[index]
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, Trajectory)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return 'Trajectory(%r)' % list(self)
+
+    def get_packed(self):
+        """Returns the first station, the number of bits each move is packed
+        into and the packed moves, or None unless the full journey is kept.
+
+        Moves are packed lowest bits first, and trailing moves along first
+        connections may be left out.
+        """
+        if self._moves is None:
+            return None
+        return self._start, self._bits, self._moves
+
+    def _pack(self, connection_index):
+        byte, shift = divmod((self._length - 1) * self._bits, 8)
+        moves = self._moves
+        value = connection_index << shift
+        while value:
+            # Bytes of moves along first connections are left unwritten
+            if byte >= len(moves):
+                moves.extend(bytearray(byte + 1 - len(moves)))
+            moves[byte] |= value & 0xff
+            value >>= 8
+            byte += 1
+
+    def _unpack(self):
+        mask = (1 << self._bits) - 1
+        packed = iter(self._moves)
+        buffered = buffered_bits = 0
+        for __ in xrange(self._length - 1):
+            while buffered_bits < self._bits:
+                buffered |= next(packed, 0) << buffered_bits
+                buffered_bits += 8
+            yield buffered & mask
+            buffered >>= self._bits
+            buffered_bits -= self._bits
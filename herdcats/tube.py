@@ -1,70 +1,661 @@
 """Functions to load and operate with the London Tube map."""
 
+import bisect
 import csv
+import hashlib
+import mmap
 import os
-import random
+import struct
+import sys
 
+from array import array
 from collections import defaultdict
+from collections import deque
+from itertools import izip
 from os import path
 
-STATIONS = None
-CONNECTIONS = None
+from . import randomness
+
+GRAPH = None
+
+DATA_FILES = ('tfl_stations.csv', 'tfl_connections.csv')
+# The compiled tube map, kept next to the data files
+GRAPH_FILE = 'tfl.graph'
+_GRAPH_FILE_MAGIC = 'HCGRAPH1'
+# Magic, hash of the data files and the number of stations, connections,
+# bytes of station names and closed stations
+_GRAPH_FILE_HEADER = struct.Struct('<8s32siiii')
+_HASH_CHUNK_SIZE = 1 << 20
+# Maps with more stations than this look station ids up in ``ids`` rather
+# than a dict, so they take no memory per station
+INDEX_DICT_LIMIT = 100000
 
 
 def _lazy_load_data(func):
     def decorated(*args, **kwargs):
-        global STATIONS, CONNECTIONS
-        if STATIONS is None:
-            STATIONS = _load_stations()
-            CONNECTIONS = _load_connections()
+        global GRAPH
+        if GRAPH is None:
+            GRAPH = _load_graph()
         return func(*args, **kwargs)
     return decorated
 
 
+@_lazy_load_data
+def load():
+    """Loads the tube map if it hasn't been already."""
+
+
+def set_graph(graph):
+    """Uses graph, such as a network loaded by ``network.load``, in place of
+    the tube map."""
+    global GRAPH
+    GRAPH = graph
+
+
+@_lazy_load_data
+def get_number_of_stations():
+    return len(GRAPH['ids'])
+
+
+@_lazy_load_data
+def get_number_of_connections():
+    return len(GRAPH['neighbors']) // 2
+
+
 @_lazy_load_data
 def get_station_name(station_id):
     """Returns station name for a given station_id."""
-    return STATIONS[station_id]['name']
+    station = GRAPH['index'][station_id]
+    name_offsets = GRAPH['name_offsets']
+    return GRAPH['names'][name_offsets[station]:name_offsets[station + 1]]
 
 
 @_lazy_load_data
-def get_random_station(exclude=None):
-    """Returns a random tube station."""
-    stations = STATIONS.keys()
-    if exclude:
-        stations = [s for s in stations if s not in exclude]
-    return random.choice(stations)
+def get_random_station(exclude=None, rng=randomness.DEFAULT):
+    """Returns a random tube station, chosen with ``rng``."""
+    stations = GRAPH['ids']
+    if exclude and len(exclude) >= len(stations):
+        # Every station might be excluded
+        return rng.choice([s for s in stations if s not in exclude])
+    while True:
+        station = rng.choice(stations)
+        if not exclude or station not in exclude:
+            return station
 
 
 @_lazy_load_data
-def get_random_connection(from_station, exclude_if_possible=None):
-    """Returns a random connecting station, or None if no connections."""
-    # Assume you can't travel from a closed station
-    if STATIONS[from_station]['is_closed']:
-        connections = []
-    else:
-        connections = CONNECTIONS[from_station]
-        # Assume you can't travel to closed stations
-        connections = [c for c in connections if not STATIONS[c]['is_closed']]
-        if exclude_if_possible:
-            possible = [
-                c for c in connections if c not in exclude_if_possible]
-            if possible:
-                connections = possible
-    if connections:
-        return random.choice(connections)
+def get_random_station_pairs(number, rng=randomness.DEFAULT):
+    """Returns arrays of ``number`` random owner and cat stations, chosen
+    with ``rng``, each cat at a different station to its owner."""
+    stations = GRAPH['ids']
+    number_of_stations = len(stations)
+    if number and number_of_stations < 2:
+        raise ValueError('Owners and cats need two stations to start at')
+    owners = rng.randbelow_many(number_of_stations, number)
+    # Offset sampling keeps each cat away from their owner's station
+    offsets = rng.randbelow_many(number_of_stations - 1, number)
+    return (
+        array('i', [stations[owner] for owner in owners]),
+        array('i', [
+            stations[(owner + offset + 1) % number_of_stations]
+            for owner, offset in izip(owners, offsets)
+        ]),
+    )
+
+
+@_lazy_load_data
+def get_random_connection(from_station, exclude_if_possible=None,
+                          rng=randomness.DEFAULT):
+    """Returns a random connecting station, or None if no connections.
+
+    The station is chosen with ``rng``.
+    """
+    # Closed stations have no open connections and are never an open
+    # connection, as you can't travel from or to a closed station
+    station = GRAPH['index'][from_station]
+    degree = GRAPH['open_degree'][station]
+    if not degree:
+        return None
+    ids = GRAPH['ids']
+    open_neighbors = GRAPH['open_neighbors']
+    start = GRAPH['offsets'][station]
+    if exclude_if_possible:
+        # Draw until a connection isn't excluded, which is uniform over
+        # those that aren't, then fall back to choosing from them directly
+        for __ in xrange(degree):
+            connection = ids[open_neighbors[start + rng.randbelow(degree)]]
+            if connection not in exclude_if_possible:
+                return connection
+        possible = [
+            ids[c] for c in open_neighbors[start:start + degree]
+            if ids[c] not in exclude_if_possible
+        ]
+        if possible:
+            return possible[rng.randbelow(len(possible))]
+    return ids[open_neighbors[start + rng.randbelow(degree)]]
 
 
 @_lazy_load_data
 def are_connected(station1, station2):
     """Returns True if station1 and station2 are connected."""
-    return station2 in CONNECTIONS[station1]
+    return (station1 << 32) + station2 in _get_edges(GRAPH)
+
+
+@_lazy_load_data
+def get_connection_index(from_station, to_station):
+    """Returns the position of to_station among from_station's connections."""
+    index = GRAPH['index']
+    offsets = GRAPH['offsets']
+    from_station = index[from_station]
+    return GRAPH['neighbors'][
+        offsets[from_station]:offsets[from_station + 1]
+    ].index(index[to_station])
+
+
+@_lazy_load_data
+def follow_connections(from_station, connection_indices):
+    """Yields the stations reached by taking each connection in turn.
+
+    The reverse of ``get_connection_index``.
+    """
+    ids = GRAPH['ids']
+    offsets = GRAPH['offsets']
+    neighbors = GRAPH['neighbors']
+    station = GRAPH['index'][from_station]
+    for connection_index in connection_indices:
+        station = neighbors[offsets[station] + connection_index]
+        yield ids[station]
+
+
+@_lazy_load_data
+def get_max_connections():
+    """Returns the number of connections of the best connected station."""
+    return GRAPH['max_degree']
+
+
+@_lazy_load_data
+def can_meet(station1, station2):
+    """Returns False if players at station1 and station2 can never be at the
+    same station, as long as each moves whenever they can.
+
+    They can't if either station is closed or they're in parts of the open
+    network with no route between them. Nor can they if their part of the
+    network splits into two sides with every connection between them, and
+    they're on different sides, as each move swaps sides.
+    """
+    if station1 == station2:
+        return True
+    connectivity = _get_connectivity(GRAPH)
+    index = GRAPH['index']
+    station1 = index[station1]
+    station2 = index[station2]
+    component = connectivity['component'][station1]
+    if component < 0 or connectivity['component'][station2] != component:
+        return False
+    colour = connectivity['colour']
+    return not (connectivity['two_sided'][component] and
+                colour[station1] != colour[station2])
+
+
+@_lazy_load_data
+def is_closed(station_id):
+    """Returns True if the station with given station_id is closed."""
+    return bool(GRAPH['closed'][GRAPH['index'][station_id]])
 
 
 @_lazy_load_data
 def close_station(station_id):
     """Close station with given station_id."""
-    STATIONS[station_id]['is_closed'] = True
+    _close_station(GRAPH, GRAPH['index'][station_id])
+
+
+@_lazy_load_data
+def reopen_stations():
+    """Reopens stations closed since the tube map was loaded."""
+    _reopen_stations(GRAPH)
+
+
+@_lazy_load_data
+def get_closures():
+    """Returns a copy of which stations are closed, for ``set_closures``."""
+    return {
+        'closed': GRAPH['closed'][:],
+        'open_neighbors': GRAPH['open_neighbors'][:],
+        'open_degree': GRAPH['open_degree'][:],
+    }
+
+
+@_lazy_load_data
+def set_closures(closures):
+    """Closes the stations closed in ``closures`` from ``get_closures``, and
+    opens the rest.
+
+    Open connections are kept in the same order as they were, so random
+    connections are chosen just as they would have been.
+    """
+    for name, values in closures.iteritems():
+        if len(values) != len(GRAPH[name]):
+            raise ValueError('Closures are of a different network')
+    for name, values in closures.iteritems():
+        GRAPH[name][:] = values
+    GRAPH['connectivity'] = None
+
+
+def _close_station(graph, station):
+    """Closes the station with index ``station`` in ``graph``.
+
+    Each station's open connections are kept at the start of its
+    ``open_neighbors`` block, so closing a station swaps it past the end of
+    the open connections of each of its neighbours.
+    """
+    if graph['closed'][station]:
+        return
+    offsets = graph['offsets']
+    open_neighbors = graph['open_neighbors']
+    open_degree = graph['open_degree']
+    start = offsets[station]
+    sources = open_neighbors[start:start + open_degree[station]]
+    graph['closed'][station] = 1
+    open_degree[station] = 0
+    for neighbor in graph['neighbors'][offsets[station]:offsets[station + 1]]:
+        start = offsets[neighbor]
+        last = start + open_degree[neighbor] - 1
+        for i in xrange(start, last + 1):
+            if open_neighbors[i] == station:
+                open_neighbors[i] = open_neighbors[last]
+                open_neighbors[last] = station
+                open_degree[neighbor] -= 1
+                break
+    if graph['connectivity'] is not None:
+        _split_component(graph, station, sources)
+
+
+def _get_edges(graph):
+    """Returns the set of connections of ``graph``, building it the first
+    time it's needed.
+
+    Each connection is held both ways as ``(station1 << 32) + station2`` for
+    the station ids at either end, which is distinct for every pair of 32
+    bit ids, so looking one up takes the same time however well connected
+    the stations are.
+    """
+    if graph['edges'] is None:
+        ids = graph['ids']
+        offsets = graph['offsets']
+        neighbors = graph['neighbors']
+        graph['edges'] = set(
+            (ids[station] << 32) + ids[neighbor]
+            for station in xrange(len(ids))
+            for neighbor in neighbors[offsets[station]:offsets[station + 1]]
+        )
+    return graph['edges']
+
+
+def _get_connectivity(graph):
+    """Returns the parts of the open network of ``graph``, working them out
+    the first time they're needed.
+
+    ``component`` labels each station with its part, -1 if closed.
+    ``two_sided`` flags parts whose stations are coloured 0 or 1 in
+    ``colour`` so every connection joins stations of different colours.
+    ``odd_cycles`` holds the stations of a cycle with an odd number of
+    connections in each other part, which shows it isn't two sided for as
+    long as they stay open.
+    """
+    if graph['connectivity'] is None:
+        number = len(graph['ids'])
+        connectivity = graph['connectivity'] = {
+            'component': array('i', [-1]) * number,
+            'colour': bytearray(number),
+            'two_sided': bytearray(),
+            'odd_cycles': [],
+            'parent': array('i', [-1]) * number,
+        }
+        component = connectivity['component']
+        for station in xrange(number):
+            if component[station] < 0 and not graph['closed'][station]:
+                _label_component(graph, station)
+    return graph['connectivity']
+
+
+def _label_component(graph, first):
+    """Gives the part of the open network with station ``first`` a new
+    label and colours its stations, finding an odd cycle in it if it isn't
+    two sided."""
+    connectivity = graph['connectivity']
+    label = len(connectivity['two_sided'])
+    component = connectivity['component']
+    colour = connectivity['colour']
+    parent = connectivity['parent']
+    offsets = graph['offsets']
+    open_neighbors = graph['open_neighbors']
+    open_degree = graph['open_degree']
+    odd_cycle = None
+    component[first] = label
+    colour[first] = 0
+    parent[first] = first
+    to_visit = deque([first])
+    while to_visit:
+        station = to_visit.popleft()
+        start = offsets[station]
+        for neighbor in open_neighbors[start:start + open_degree[station]]:
+            if component[neighbor] != label:
+                component[neighbor] = label
+                colour[neighbor] = 1 - colour[station]
+                parent[neighbor] = station
+                to_visit.append(neighbor)
+            elif odd_cycle is None and colour[neighbor] == colour[station]:
+                odd_cycle = _get_odd_cycle(parent, station, neighbor)
+    connectivity['two_sided'].append(odd_cycle is None)
+    connectivity['odd_cycles'].append(odd_cycle)
+
+
+def _get_odd_cycle(parent, station1, station2):
+    """Returns the stations of the odd cycle made by the connection between
+    station1 and station2, found as far as each other from the first
+    station of a search with ``parent`` of each station reached."""
+    cycle = set([station1, station2])
+    while station1 != station2:
+        station1 = parent[station1]
+        station2 = parent[station2]
+        cycle.add(station1)
+        cycle.add(station2)
+    return cycle
+
+
+def _split_component(graph, station, sources):
+    """Updates the parts of the open network for the closing of ``station``,
+    which was open to stations ``sources``.
+
+    Its part may split into a piece for each of those stations. They
+    are searched from in turn, a station each, until all but one search has
+    run out of stations or joined another. The pieces whose search ran out
+    get new labels; the last, which may be most of the network, keeps its
+    label and colours unless its odd cycle is gone, when it may have become
+    two sided.
+    """
+    connectivity = graph['connectivity']
+    component = connectivity['component']
+    label = component[station]
+    component[station] = -1
+    if len(sources) > 1:
+        sources = _split_off_pieces(graph, sources)
+    odd_cycle = connectivity['odd_cycles'][label]
+    if sources and odd_cycle is not None and (
+            station in odd_cycle or
+            component[next(iter(odd_cycle))] != label):
+        _label_component(graph, sources[0])
+
+
+def _split_off_pieces(graph, sources):
+    """Labels the pieces of a part of the open network split by a closing
+    station, as for ``_split_component``, and returns a station of the
+    piece left with the part's label."""
+    component = graph['connectivity']['component']
+    offsets = graph['offsets']
+    open_neighbors = graph['open_neighbors']
+    open_degree = graph['open_degree']
+    # Each search's stations to visit, and the search each station was
+    # reached by
+    searches = dict((source, deque([source])) for source in sources)
+    reached_by = dict((source, source) for source in sources)
+    joined = {}
+
+    def find(search):
+        while search in joined:
+            search = joined[search]
+        return search
+
+    while len(searches) > 1:
+        for search in list(searches):
+            if search not in searches or len(searches) < 2:
+                continue
+            to_visit = searches[search]
+            if not to_visit:
+                del searches[search]
+                _label_component(graph, search)
+                continue
+            visiting = to_visit.popleft()
+            start = offsets[visiting]
+            for neighbor in open_neighbors[
+                    start:start + open_degree[visiting]]:
+                other = reached_by.get(neighbor)
+                if other is None:
+                    reached_by[neighbor] = search
+                    to_visit.append(neighbor)
+                    continue
+                other = find(other)
+                if other != search:
+                    # The searches meet, so are in the same piece
+                    to_visit.extend(searches.pop(other))
+                    joined[other] = search
+    return list(searches)
+
+
+def _load_graph():
+    """Returns the tube map compiled from the data files."""
+    return _load_compiled_graph(
+        [_get_data_path(file_name) for file_name in DATA_FILES],
+        _get_data_path(GRAPH_FILE),
+        lambda: _build_graph(_load_stations(), _load_connections()))
+
+
+def _load_compiled_graph(data_paths, graph_path, build_graph):
+    """Returns the graph compiled from the files in data_paths.
+
+    The graph built by ``build_graph`` is saved in ``graph_path`` with a hash
+    of the data files, and read back from it while they are unchanged.
+    """
+    digest = _hash_files(data_paths)
+    graph = _read_graph(graph_path, digest)
+    if graph is None:
+        graph = build_graph()
+        _write_graph(graph_path, digest, graph)
+    return graph
+
+
+def _build_graph(stations, connections):
+    """Returns the compact form of the tube map used by the simulation.
+
+    Stations get dense indices in order of station id: ``ids`` is indexed by
+    them and ``index`` maps station ids back. The indices of the stations
+    connected to station ``i`` are ``neighbors[offsets[i]:offsets[i + 1]]``
+    and its name is ``names[name_offsets[i]:name_offsets[i + 1]]``.
+    ``open_neighbors`` holds the same blocks as ``neighbors``, reordered so
+    the first ``open_degree[i]`` are open, and ``closed`` flags closed
+    stations.
+    """
+    ids = array('i', sorted(stations))
+    index = dict((station_id, i) for i, station_id in enumerate(ids))
+    offsets = array('i', [0])
+    neighbors = array('i')
+    name_offsets = array('i', [0])
+    for station_id in ids:
+        name_offsets.append(
+            name_offsets[-1] + len(stations[station_id]['name']))
+        neighbors.extend(sorted(set(
+            index[c] for c in connections.get(station_id, ())
+            if c != station_id
+        )))
+        offsets.append(len(neighbors))
+    return _create_graph(
+        ids,
+        offsets,
+        neighbors,
+        ''.join(stations[station_id]['name'] for station_id in ids),
+        name_offsets,
+        array('i', (
+            i for i, station_id in enumerate(ids)
+            if stations[station_id]['is_closed']
+        )),
+    )
+
+
+def _create_graph(ids, offsets, neighbors, names, name_offsets,
+                  initially_closed):
+    graph = {
+        'ids': ids,
+        'index': _index_ids(ids),
+        'names': names,
+        'name_offsets': name_offsets,
+        'offsets': offsets,
+        'neighbors': neighbors,
+        'open_neighbors': array('i', neighbors),
+        'open_degree': array('i', [0]) * len(ids),
+        'closed': bytearray(len(ids)),
+        'initially_closed': initially_closed,
+        'max_degree': max([
+            offsets[i + 1] - offsets[i] for i in xrange(len(ids))] or [0]),
+        'connectivity': None,
+        'edges': None,
+    }
+    _reopen_stations(graph)
+    return graph
+
+
+def _index_ids(ids):
+    """Returns a mapping of the station ids in sorted ``ids`` to their
+    positions in it."""
+    if len(ids) > INDEX_DICT_LIMIT:
+        return _ArrayIndex(ids)
+    return dict((station_id, i) for i, station_id in enumerate(ids))
+
+
+class _ArrayIndex(object):
+    """Maps station ids to their positions in sorted, distinct ``ids``.
+
+    Positions are worked out from the first id when the ids have no gaps,
+    and found by binary search when they do.
+    """
+    __slots__ = ('_ids', '_first', '_dense')
+
+    def __init__(self, ids):
+        self._ids = ids
+        self._first = ids[0] if ids else 0
+        self._dense = not ids or ids[-1] - ids[0] == len(ids) - 1
+
+    def __getitem__(self, station_id):
+        if self._dense:
+            i = station_id - self._first
+        else:
+            i = bisect.bisect_left(self._ids, station_id)
+        if 0 <= i < len(self._ids) and self._ids[i] == station_id:
+            return i
+        raise KeyError(station_id)
+
+    def __contains__(self, station_id):
+        try:
+            self[station_id]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __eq__(self, other):
+        if isinstance(other, _ArrayIndex):
+            return self._ids == other._ids
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+
+def _write_graph(graph_path, digest, graph):
+    """Saves the arrays of ``graph`` to ``graph_path``."""
+    temporary_path = '%s.%d' % (graph_path, os.getpid())
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(_GRAPH_FILE_HEADER.pack(
+                _GRAPH_FILE_MAGIC, digest, len(graph['ids']),
+                len(graph['neighbors']), len(graph['names']),
+                len(graph['initially_closed'])))
+            for key in ('ids', 'offsets', 'neighbors', 'name_offsets',
+                        'initially_closed'):
+                _write_ints(f, graph[key])
+            f.write(graph['names'])
+        # Readers never see a half written file
+        os.rename(temporary_path, graph_path)
+    except EnvironmentError:
+        # The map is compiled on every load if the data files' directory
+        # isn't writable
+        if path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _read_graph(graph_path, digest):
+    """Returns the graph saved in ``graph_path``, or None if it isn't there
+    or was compiled from other data files."""
+    try:
+        with open(graph_path, 'rb') as f:
+            graph_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        return None
+    try:
+        if len(graph_file) < _GRAPH_FILE_HEADER.size:
+            return None
+        (magic, file_digest, stations, connections, name_bytes,
+         closed) = _GRAPH_FILE_HEADER.unpack_from(graph_file)
+        size = (_GRAPH_FILE_HEADER.size + name_bytes + 4 * (
+            stations + (stations + 1) + connections + (stations + 1) +
+            closed))
+        if (magic != _GRAPH_FILE_MAGIC or file_digest != digest or
+                len(graph_file) != size):
+            return None
+        position = _GRAPH_FILE_HEADER.size
+        arrays = []
+        for length in (stations, stations + 1, connections, stations + 1,
+                       closed):
+            arrays.append(_read_ints(graph_file, position, length))
+            position += 4 * length
+        ids, offsets, neighbors, name_offsets, initially_closed = arrays
+        names = graph_file[position:position + name_bytes]
+    finally:
+        graph_file.close()
+    return _create_graph(
+        ids, offsets, neighbors, names, name_offsets, initially_closed)
+
+
+def _write_ints(f, values):
+    values = array('i', values)
+    # Saved little endian whatever the machine
+    if sys.byteorder == 'big':
+        values.byteswap()
+    values.tofile(f)
+
+
+def _read_ints(graph_file, position, length):
+    values = array('i', graph_file[position:position + 4 * length])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _hash_files(paths):
+    digest = hashlib.sha256()
+    for file_path in paths:
+        digest.update('%s:%d:' % (
+            path.basename(file_path), path.getsize(file_path)))
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), ''):
+                digest.update(chunk)
+    return digest.digest()
+
+
+def _reopen_stations(graph):
+    """Opens every station in ``graph`` but those closed in the tube data."""
+    offsets = graph['offsets']
+    graph['open_neighbors'][:] = graph['neighbors']
+    graph['open_degree'][:] = array(
+        'i', (offsets[i + 1] - offsets[i] for i in xrange(len(offsets) - 1)))
+    graph['closed'][:] = bytearray(len(graph['closed']))
+    graph['connectivity'] = None
+    for station in graph['initially_closed']:
+        _close_station(graph, station)
 
 
 def _load_stations():
@@ -88,6 +679,9 @@ def _load_connections():
         for station1, station2 in reader:
             station1 = int(station1)
             station2 = int(station2)
+            # Some connections are listed more than once
+            if station2 in connections[station1]:
+                continue
             # We assume that connections go both ways between each
             # pair of stations
             connections[station1].append(station2)
@@ -96,5 +690,9 @@ def _load_connections():
 
 
 def _open_data_file(file_name):
+    return open(_get_data_path(file_name))
+
+
+def _get_data_path(file_name):
     here = path.abspath(path.dirname(__file__))
-    return open(os.path.join(here, 'data', file_name))
+    return os.path.join(here, 'data', file_name)
@@ -0,0 +1,550 @@
+"""Array based owners and cats for large simulations.
+
+An alternative to the ``players`` module that keeps every owner and cat in
+NumPy arrays and moves all pairs still searching in one batched step per
+turn. The rules are the same: owners prefer stations they haven't visited,
+nobody travels from or to a closed station and the station where a cat is
+found is closed. As with ``players.move`` all owners and cats move at the same
+time, so stations closed during a turn only affect the following turns.
+
+Requires NumPy (``pip install herdcats[numpy]``).
+"""
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from array import array
+from itertools import islice
+
+from . import events
+from . import randomness
+from . import streaming
+from . import trajectory
+from . import tube
+
+# Steps of journeys compared at once when counting one hops
+ONE_HOP_CHUNK_SIZE = 1 << 20
+
+
+def create(number, visited_window=None, history=trajectory.FULL,
+           rng=randomness.DEFAULT):
+    """Returns arrays of owners and cats positioned at random stations.
+
+    Owners avoid every station they have visited, or only the last
+    ``visited_window`` stations if given. ``history`` is how much of each
+    journey to keep, as for ``trajectory.create``. The arrays get their own
+    NumPy generator, seeded from ``rng``.
+    """
+    _check_numpy()
+    network = _load_network()
+    rng = numpy.random.RandomState(
+        [rng.getrandbits(32) for __ in xrange(4)])
+    number_of_stations = len(network['station_ids'])
+    owner = rng.randint(number_of_stations, size=number)
+    # Offset sampling keeps each cat away from their owner's station
+    cat = (owner + rng.randint(1, number_of_stations, size=number)
+           ) % number_of_stations
+    state = dict(
+        network,
+        rng=rng,
+        owner=owner,
+        cat=cat,
+        owner_start=owner.copy(),
+        cat_start=cat.copy(),
+        owner_moves=numpy.zeros(number, dtype=numpy.int64),
+        cat_moves=numpy.zeros(number, dtype=numpy.int64),
+        found=numpy.zeros(number, dtype=bool),
+        unreachable=numpy.zeros(number, dtype=bool),
+        history=history,
+    )
+    for player in ('owner', 'cat'):
+        if history == trajectory.FULL:
+            state[player + '_history'] = []
+        elif history != trajectory.NONE:
+            # Each player's last stations, overwritten in turn
+            trail = numpy.empty(
+                (number, history),
+                dtype=numpy.min_scalar_type(number_of_stations))
+            if history:
+                trail[:, 0] = state[player]
+            state[player + '_trail'] = trail
+    if visited_window is None:
+        state['visited'] = numpy.zeros(
+            (number, (number_of_stations + 7) // 8), dtype=numpy.uint8)
+    else:
+        # Each owner's last stations, overwritten in turn
+        state['recent'] = numpy.full(
+            (number, visited_window), -1, dtype=numpy.intp)
+    _mark_visited(state, numpy.arange(number), owner)
+    return state
+
+
+def move(state, turn, searching=None, accumulator=None, rng=None):
+    """Returns indices of owners still searching after moving them and
+    their cats to the next station.
+
+    Only the owners and cats at the indices in ``searching`` move, or all
+    those still searching if it isn't given. Moves are added to the
+    ``streaming`` accumulator if given. Once stations have closed, owners
+    who can no longer reach their cat are retired as for
+    ``retire_unreachable``. ``rng`` is unused, as stations are chosen with
+    the generator seeded by ``create``.
+    """
+    if searching is None:
+        searching = get_searching(state)
+    owner = state['owner'][searching]
+    cat = state['cat'][searching]
+
+    next_owner, owner_moved = _get_random_connections(
+        state, owner, visited_by=searching)
+    next_cat, cat_moved = _get_random_connections(state, cat)
+
+    _record_moves(state, 'owner', searching, next_owner, owner_moved)
+    _record_moves(state, 'cat', searching, next_cat, cat_moved)
+    _mark_visited(state, searching, next_owner)
+
+    found = next_owner == next_cat
+    if accumulator is not None:
+        _accumulate(
+            state, accumulator, searching, (next_owner, owner_moved),
+            (next_cat, cat_moved), found)
+    if found.any():
+        _handle_found_cats(state, searching[found], next_owner[found])
+        searching = retire_unreachable(
+            state, searching[~found], accumulator)
+    return searching
+
+
+def get_searching(state):
+    """Returns indices of owners who haven't found their cat and may still
+    reach it."""
+    return numpy.flatnonzero(~(state['found'] | state['unreachable']))
+
+
+def retire_unreachable(state, searching, accumulator=None):
+    """Returns indices of owners in ``searching`` who may still reach their
+    cat, marking the others unreachable and adding them to the
+    ``streaming`` accumulator if given."""
+    reachable = _can_meet(state['owner'][searching], state['cat'][searching])
+    if reachable.all():
+        return searching
+    state['unreachable'][searching[~reachable]] = True
+    if accumulator is not None:
+        accumulator['total_unreachable'] += int((~reachable).sum())
+    return searching[reachable]
+
+
+def are_all_cats_found(state):
+    """Returns True if all owners have found their cat, False otherwise."""
+    return state['found'].all()
+
+
+def create_accumulator(state):
+    """Returns a ``streaming`` accumulator of owners and cats that haven't
+    moved yet."""
+    number = len(state['owner'])
+    accumulator = streaming.create([])
+    accumulator['total_cats'] = number
+    for lengths in ('one_hop_counts', 'owner_lengths', 'cat_lengths'):
+        accumulator[lengths] = array('l', [0]) * number
+    owner_moves = _as_array(accumulator['owner_lengths'])
+    owner_moves += 1
+    cat_moves = _as_array(accumulator['cat_lengths'])
+    cat_moves += 1
+    _count_visits(state, accumulator, state['owner'])
+    _count_visits(state, accumulator, state['cat'])
+    one_hop_counts = _as_array(accumulator['one_hop_counts'])
+    one_hop_counts += _are_connected(state, state['owner'], state['cat'])
+    return accumulator
+
+
+def get_owners_and_cats(state):
+    """Returns owners and cats in the list of dicts format of ``players``."""
+    owner_paths = _get_paths(state, 'owner')
+    cat_paths = _get_paths(state, 'cat')
+    owners_and_cats = [
+        {'owner': owner_path, 'cat': cat_path}
+        for owner_path, cat_path in zip(owner_paths, cat_paths)
+    ]
+    for i in numpy.flatnonzero(state['unreachable']):
+        owners_and_cats[i]['unreachable'] = True
+    return owners_and_cats
+
+
+@tube._lazy_load_data
+def get_one_hop_counts(owners_and_cats):
+    """Returns the number of times each owner was one station away from
+    their cat, for owners and cats in the list of dicts format of
+    ``players``.
+
+    Journeys are compared step by step, as for
+    ``players.get_number_of_times_owner_one_hop_away``. Pairs are taken
+    shortest journeys first, as many at a time as have ``ONE_HOP_CHUNK_SIZE``
+    steps between them, and each chunk's journeys laid out as rows of an
+    array.
+    """
+    _check_numpy()
+    lengths = numpy.array([
+        min(len(owner_and_cat['owner']), len(owner_and_cat['cat']))
+        for owner_and_cat in owners_and_cats
+    ], dtype=numpy.intp)
+    counts = numpy.zeros(len(lengths), dtype=numpy.int64)
+    edges = _get_edge_keys()
+    number_of_stations = len(tube.GRAPH['ids'])
+    order = numpy.argsort(lengths, kind='mergesort')
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and (
+                (end + 1 - start) * lengths[order[end]] <= ONE_HOP_CHUNK_SIZE):
+            end += 1
+        pairs = order[start:end]
+        width = lengths[pairs[-1]]
+        steps = _get_journeys(owners_and_cats, pairs, 'owner', width)
+        steps *= number_of_stations
+        steps += _get_journeys(owners_and_cats, pairs, 'cat', width)
+        if len(edges):
+            one_hop = edges.take(
+                numpy.searchsorted(edges, steps), mode='clip') == steps
+            one_hop &= numpy.arange(width) < lengths[pairs, numpy.newaxis]
+            counts[pairs] = one_hop.sum(axis=1)
+        start = end
+    return counts.tolist()
+
+
+def _get_edge_keys():
+    """Returns the sorted keys of connections between stations with indices
+    ``i`` and ``j``, ``i * number_of_stations + j``."""
+    graph = tube.GRAPH
+    number = len(graph['ids'])
+    offsets = numpy.frombuffer(graph['offsets'], dtype=numpy.int32)
+    # The keys of each station's block of neighbours follow those of the
+    # one before
+    edges = numpy.repeat(
+        numpy.arange(number, dtype=numpy.int64), numpy.diff(offsets))
+    edges *= number
+    edges += numpy.frombuffer(graph['neighbors'], dtype=numpy.int32)
+    return edges
+
+
+def _get_journeys(owners_and_cats, pairs, player, width):
+    """Returns the first ``width`` station indices of the journeys of
+    ``player`` of each pair, one row each, padded past their end."""
+    station_ids = numpy.frombuffer(tube.GRAPH['ids'], dtype=numpy.int32)
+    journeys = numpy.zeros((len(pairs), width), dtype=numpy.int64)
+    packed_rows = []
+    packed = []
+    for row, pair in enumerate(pairs):
+        journey = owners_and_cats[pair][player]
+        if isinstance(journey, trajectory.Trajectory):
+            packed_journey = journey.get_packed()
+            if packed_journey is not None:
+                packed_rows.append(row)
+                packed.append(packed_journey)
+                continue
+        journey = list(islice(journey, width))
+        journeys[row, :len(journey)] = numpy.searchsorted(
+            station_ids, journey)
+    if packed:
+        journeys[packed_rows] = _unpack_journeys(packed, width)
+    return journeys
+
+
+def _unpack_journeys(packed, width):
+    """Returns the first ``width`` station indices of journeys packed by
+    ``trajectory.Trajectory``, one row each, following their moves a step
+    at a time for all of them at once."""
+    graph = tube.GRAPH
+    offsets = numpy.frombuffer(graph['offsets'], dtype=numpy.int32)
+    neighbors = numpy.frombuffer(graph['neighbors'], dtype=numpy.int32)
+    bits = packed[0][1]
+    number_of_bytes = ((width - 1) * bits + 7) // 8
+    moves = numpy.zeros((len(packed), number_of_bytes), dtype=numpy.uint8)
+    for row, (__, __, packed_moves) in enumerate(packed):
+        packed_moves = packed_moves[:number_of_bytes]
+        if packed_moves:
+            moves[row, :len(packed_moves)] = numpy.frombuffer(
+                bytes(packed_moves), dtype=numpy.uint8)
+    # Moves are packed lowest bits first
+    move_bits = numpy.unpackbits(moves, axis=1).reshape(
+        len(packed), number_of_bytes, 8)[:, :, ::-1]
+    connections = move_bits.reshape(len(packed), -1)[
+        :, :(width - 1) * bits].reshape(len(packed), width - 1, bits).dot(
+            1 << numpy.arange(bits))
+    index = tube.GRAPH['index']
+    journeys = numpy.empty((len(packed), width), dtype=numpy.int64)
+    journeys[:, 0] = [index[start] for start, __, __ in packed]
+    for step in xrange(1, width):
+        journeys[:, step] = neighbors.take(
+            offsets[journeys[:, step - 1]] + connections[:, step - 1],
+            mode='clip')
+    return journeys
+
+
+def _check_numpy():
+    if numpy is None:
+        raise ImportError('The array engine requires numpy')
+
+
+@tube._lazy_load_data
+def _load_network():
+    graph = tube.GRAPH
+    station_ids = numpy.frombuffer(graph['ids'], dtype=numpy.int32)
+    offsets = numpy.frombuffer(graph['offsets'], dtype=numpy.int32)
+    degree = numpy.diff(offsets)
+    stations = numpy.arange(len(station_ids))
+    # Pad each station's neighbours with -1 so all stations can be
+    # looked up at once
+    neighbors = numpy.full(
+        (len(station_ids), max(degree.max() if len(degree) else 0, 1)), -1,
+        dtype=numpy.intp)
+    rows = numpy.repeat(stations, degree)
+    columns = numpy.arange(offsets[-1]) - numpy.repeat(offsets[:-1], degree)
+    neighbors[rows, columns] = numpy.frombuffer(
+        graph['neighbors'], dtype=numpy.int32)
+    network = {
+        'station_ids': station_ids,
+        # Where each station's bit lives in a visited bitset, with a blank
+        # entry at the end for the -1 padding
+        'visited_byte': numpy.append(stations >> 3, 0),
+        'visited_bit': numpy.append(1 << (stations & 7), 0).astype(
+            numpy.uint8),
+        'neighbors': neighbors,
+        'open_neighbors': neighbors.copy(),
+        'open_degree': degree.copy(),
+        'closed': numpy.zeros(len(station_ids), dtype=bool),
+    }
+    for station in numpy.flatnonzero(
+            numpy.frombuffer(graph['closed'], dtype=numpy.uint8)):
+        _close_station(network, station)
+    return network
+
+
+def _close_station(network, station):
+    """Closes a station and drops it from its neighbours' open stations."""
+    network['closed'][station] = True
+    # You can't travel from a closed station
+    network['open_degree'][station] = 0
+    # ...nor to one, so pack the remaining open neighbours to the left
+    for neighbor in network['neighbors'][station]:
+        if neighbor < 0:
+            break
+        open_neighbors = network['open_neighbors'][neighbor]
+        still_open = open_neighbors[
+            (open_neighbors >= 0) & (open_neighbors != station)]
+        open_neighbors[:] = -1
+        open_neighbors[:len(still_open)] = still_open
+        if not network['closed'][neighbor]:
+            network['open_degree'][neighbor] = len(still_open)
+
+
+@tube._lazy_load_data
+def _can_meet(owner, cat):
+    """Returns a mask of the owners who may still meet their cat, as for
+    ``tube.can_meet`` with station indices."""
+    connectivity = tube._get_connectivity(tube.GRAPH)
+    component = numpy.frombuffer(connectivity['component'], dtype=numpy.int32)
+    colour = numpy.frombuffer(connectivity['colour'], dtype=numpy.uint8)
+    two_sided = numpy.array(connectivity['two_sided'], dtype=bool)
+    owner_component = component[owner]
+    can_meet = (owner_component >= 0) & (owner_component == component[cat])
+    # Parts on different sides of a two sided part never meet
+    can_meet[can_meet] &= ~(
+        two_sided[owner_component[can_meet]] &
+        (colour[owner[can_meet]] != colour[cat[can_meet]]))
+    return can_meet | (owner == cat)
+
+
+def _get_random_connections(state, stations, visited_by=None):
+    """Returns next stations and a mask of which players could move.
+
+    Each player picks uniformly from the open stations connected to their
+    own, restricted to stations not visited by the pairs in ``visited_by``
+    if that leaves any choice.
+    """
+    degree = state['open_degree'][stations]
+    moved = degree > 0
+    uniform = state['rng'].random_sample(len(stations))
+    if visited_by is None:
+        choice = (uniform * degree).astype(numpy.int32)
+        next_stations = state['open_neighbors'][stations, choice]
+    else:
+        candidates = state['open_neighbors'][stations]
+        possible = candidates >= 0
+        unvisited = possible & ~_is_visited(state, visited_by, candidates)
+        possible &= ~unvisited.any(axis=1)[:, numpy.newaxis]
+        possible |= unvisited
+        # Pick the n-th possible station with n uniform in the choices
+        running_total = possible.cumsum(axis=1, dtype=numpy.int32)
+        choice = (uniform * running_total[:, -1]).astype(numpy.int32)
+        choice = (running_total > choice[:, numpy.newaxis]).argmax(axis=1)
+        next_stations = candidates[numpy.arange(len(stations)), choice]
+    return numpy.where(moved, next_stations, stations), moved
+
+
+def _is_visited(state, pairs, stations):
+    if 'recent' in state:
+        recent = state['recent'][pairs]
+        return (
+            stations[:, :, numpy.newaxis] == recent[:, numpy.newaxis, :]
+        ).any(axis=2)
+    visited = state['visited']
+    flat_index = (
+        (pairs * visited.shape[1])[:, numpy.newaxis] +
+        state['visited_byte'][stations])
+    bytes_ = visited.ravel().take(flat_index)
+    return (bytes_ & state['visited_bit'][stations]).astype(bool)
+
+
+def _mark_visited(state, pairs, stations):
+    if 'recent' in state:
+        recent = state['recent']
+        if recent.shape[1]:
+            slot = state['owner_moves'][pairs] % recent.shape[1]
+            recent[pairs, slot] = stations
+        return
+    visited = state['visited']
+    visited[pairs, state['visited_byte'][stations]] |= (
+        state['visited_bit'][stations])
+
+
+def _record_moves(state, player, searching, next_stations, moved):
+    active = searching
+    if not moved.all():
+        active = searching[moved]
+        next_stations = next_stations[moved]
+    if state['history'] == trajectory.FULL:
+        # Keep which connection each player took rather than the station.
+        # The same searching array is shared by every turn until a cat is
+        # found, and which players moved is one bit each.
+        connections = (
+            state['neighbors'][state[player][active]] ==
+            next_stations[:, numpy.newaxis]).argmax(axis=1)
+        state[player + '_history'].append((
+            searching,
+            None if active is searching else numpy.packbits(moved),
+            _pack(connections, _get_connection_bits(state)),
+        ))
+    state[player][active] = next_stations
+    state[player + '_moves'][active] += 1
+    trail = state.get(player + '_trail')
+    if trail is not None and trail.shape[1]:
+        slot = state[player + '_moves'][active] % trail.shape[1]
+        trail[active, slot] = next_stations
+
+
+def _get_connection_bits(state):
+    return max((state['neighbors'].shape[1] - 1).bit_length(), 1)
+
+
+def _pack(values, bits):
+    """Returns values packed into ``bits`` bits each."""
+    value_bits = numpy.unpackbits(
+        values.astype(numpy.uint8)[:, numpy.newaxis], axis=1)
+    return numpy.packbits(value_bits[:, 8 - bits:])
+
+
+def _unpack(packed, bits, count):
+    value_bits = numpy.unpackbits(packed)[:count * bits].reshape(count, bits)
+    return value_bits.dot(1 << numpy.arange(bits - 1, -1, -1))
+
+
+def _accumulate(state, accumulator, searching, owner_moves, cat_moves,
+                found):
+    next_owner, owner_moved = owner_moves
+    next_cat, cat_moved = cat_moves
+    owner_lengths = _as_array(accumulator['owner_lengths'])
+    cat_lengths = _as_array(accumulator['cat_lengths'])
+    _count_visits(state, accumulator, next_owner[owner_moved])
+    _count_visits(state, accumulator, next_cat[cat_moved])
+    # Journeys are compared step by step, so once an owner or cat misses a
+    # move their later stations are never compared
+    compared = owner_moved & cat_moved & (
+        owner_lengths[searching] == cat_lengths[searching])
+    one_hop = compared & _are_connected(state, next_owner, next_cat)
+    _as_array(accumulator['one_hop_counts'])[searching[one_hop]] += 1
+    owner_lengths[searching] += owner_moved
+    cat_lengths[searching] += cat_moved
+    accumulator['total_found'] += int(found.sum())
+    accumulator['total_turns_to_find'] += int(
+        owner_lengths[searching[found]].sum())
+
+
+def _count_visits(state, accumulator, stations):
+    visits = numpy.bincount(stations, minlength=len(state['station_ids']))
+    visited = numpy.flatnonzero(visits)
+    accumulator['station_visits'].update(dict(zip(
+        state['station_ids'][visited].tolist(), visits[visited].tolist())))
+
+
+def _are_connected(state, stations1, stations2):
+    return (
+        state['neighbors'][stations1] == stations2[:, numpy.newaxis]
+    ).any(axis=1)
+
+
+def _as_array(counts):
+    return numpy.frombuffer(counts, dtype=numpy.int_)
+
+
+def _handle_found_cats(state, pairs, stations):
+    state['found'][pairs] = True
+    for station in numpy.unique(stations):
+        _close_station(state, station)
+        tube.close_station(int(state['station_ids'][station]))
+    for owner_id, station in zip(pairs, stations):
+        events.found_cat(
+            int(owner_id), int(state['station_ids'][station]))
+
+
+def _get_paths(state, player):
+    """Returns the stations kept for each player, in order."""
+    if state['history'] == trajectory.FULL:
+        paths = _replay_history(state, player)
+    elif state['history'] == trajectory.NONE:
+        paths = state[player][:, numpy.newaxis]
+    else:
+        return _get_trails(state, player)
+    return [state['station_ids'][path].tolist() for path in paths]
+
+
+def _replay_history(state, player):
+    number = len(state[player + '_start'])
+    if not number:
+        return []
+    bits = _get_connection_bits(state)
+    current = state[player + '_start'].copy()
+    pairs = [numpy.arange(number)]
+    stations = [current.copy()]
+    for searching, moved, connections in state[player + '_history']:
+        active = searching
+        if moved is not None:
+            moved = numpy.unpackbits(moved)[:len(searching)].astype(bool)
+            active = searching[moved]
+        current[active] = state['neighbors'][
+            current[active], _unpack(connections, bits, len(active))]
+        pairs.append(active)
+        stations.append(current[active])
+    pairs = numpy.concatenate(pairs)
+    stations = numpy.concatenate(stations)
+    # A stable sort keeps each player's moves in the order they happened
+    order = numpy.argsort(pairs, kind='mergesort')
+    ends = numpy.cumsum(numpy.bincount(pairs, minlength=number))
+    return numpy.split(stations[order], ends[:-1])
+
+
+def _get_trails(state, player):
+    trail = state[player + '_trail']
+    retained = trail.shape[1]
+    moves = state[player + '_moves']
+    # Oldest first, counting back from each player's latest station
+    age = numpy.arange(retained - 1, -1, -1)
+    slots = (moves[:, numpy.newaxis] - age) % max(retained, 1)
+    stations = state['station_ids'][
+        trail[numpy.arange(len(trail))[:, numpy.newaxis], slots]]
+    kept = numpy.minimum(moves + 1, retained)
+    return [
+        path[retained - count:].tolist()
+        for path, count in zip(stations, kept)
+    ]
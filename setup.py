@@ -74,6 +74,7 @@ setup(
     # $ pip install -e .[dev,test]
     extras_require={
         'dev': ['check-manifest'],
+        'numpy': ['numpy'],
         'test': [
             'tox',
             'pytest',
@@ -0,0 +1,93 @@
+import json
+
+from herdcats import benchmark
+from herdcats import tube
+
+from . import utils
+
+
+def test_measure_simulation(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    mocker.patch('herdcats.events.found_cat')
+
+    measurement = benchmark.measure(3, turns=2)
+
+    assert measurement['number'] == 3
+    assert 1 <= measurement['turns'] <= 2
+    assert measurement['time_to_first_turn_seconds'] >= (
+        measurement['load_seconds'])
+    assert measurement['peak_rss_kb'] > 0
+    assert 'get_most_visited_station' in measurement['metrics_seconds']
+
+
+def test_rates_leave_out_first_turn(mocker):
+    mocker.patch('herdcats.tube.load')
+    mocker.patch('herdcats.benchmark._time_metrics')
+
+    def simulate(number, on_turn, **kwargs):
+        on_turn(1, 4)
+        on_turn(2, 4)
+        on_turn(3, 2)
+        return 'results', 'calculator'
+    mocker.patch('herdcats.simulation.simulate').side_effect = simulate
+    mocker.patch('time.time').side_effect = [0, 1, 2, 3, 5]
+
+    measurement = benchmark.measure(4)
+
+    assert measurement['time_to_first_turn_seconds'] == 2
+    assert measurement['turns_per_second'] == 2.0 / 3
+    assert measurement['pair_moves_per_second'] == 6.0 / 3
+
+
+def test_each_size_measured_in_new_process(mocker):
+    check_output = mocker.patch('subprocess.check_output')
+    check_output.return_value = 'Owner 1 found cat 1\n{"number": 10}\n'
+    mocker.patch('herdcats.benchmark._get_revision').return_value = 'abc'
+
+    results = benchmark.run(sizes=[10], engine='array', turns=5, seed=1)
+
+    assert results['results'] == [{'number': 10}]
+    assert results['revision'] == 'abc'
+    command = check_output.call_args[0][0]
+    assert command[1:] == [
+        '-m', 'herdcats.benchmark', '--measure', '10', '--engine', 'array',
+        '--turns', '5', '--seed', '1']
+
+
+def test_each_size_measured_on_each_generated_network(mocker):
+    check_output = mocker.patch('subprocess.check_output')
+    check_output.return_value = '{"number": 10}\n'
+
+    results = benchmark.run(sizes=[10, 20], graphs=['grid:100', 'ring:50'])
+
+    assert len(results['results']) == 4
+    command = check_output.call_args[0][0]
+    assert command[-2:] == ['--graph', 'ring:50']
+
+
+def test_measure_on_generated_network(mocker):
+    mocker.patch('herdcats.tube.GRAPH', None)
+    mocker.patch('herdcats.events.found_cat')
+
+    measurement = benchmark.measure(3, turns=2, graph='grid:100')
+
+    assert measurement['graph'] == 'grid:100'
+    assert tube.get_number_of_stations() == 100
+
+
+def test_compare_prints_ratios(capsys):
+    base = {'results': [{
+        'number': 10, 'turns_per_second': 100.0,
+        'metrics_seconds': {'get_total_cats': 2.0}}]}
+    results = json.loads(json.dumps({'results': [{
+        'number': 10, 'turns_per_second': 200.0,
+        'metrics_seconds': {'get_total_cats': 1.0}}]}))
+
+    benchmark.compare(base, results)
+
+    out, __ = capsys.readouterr()
+    assert out.splitlines() == [
+        '10 owners and cats:',
+        '    get_total_cats: 2 -> 1 (x0.50)',
+        '    turns_per_second: 100 -> 200 (x2.00)',
+    ]
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from herdcats import checkpoint
+from herdcats import tube
+
+from . import utils
+
+
+@pytest.fixture
+def graph(mocker):
+    graph = utils.get_graph()
+    mocker.patch('herdcats.tube.GRAPH', graph)
+    return graph
+
+
+def test_checkpoint_restores_closed_stations(tmpdir, mocker, graph):
+    path = str(tmpdir.join('run.checkpoint'))
+    tube.close_station(4)
+    tube.close_station(1)
+    closures = tube.get_closures()
+    writer = checkpoint.create(path, seconds=0)
+
+    assert checkpoint.save(writer, {'options': 'options', 'turn': 3})
+    checkpoint.finish(writer)
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    simulation = checkpoint.load(path, 'options')
+
+    assert simulation['turn'] == 3
+    assert tube.get_closures() == closures
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_checkpoint_written_without_fork(tmpdir, monkeypatch, graph):
+    monkeypatch.delattr(os, 'fork')
+    path = str(tmpdir.join('run.checkpoint'))
+    writer = checkpoint.create(path, seconds=0)
+
+    checkpoint.save(writer, {'options': 'options'})
+
+    assert checkpoint.load(path, 'options')['options'] == 'options'
+
+
+def test_checkpoints_wait_for_interval(tmpdir, mocker, graph):
+    path = str(tmpdir.join('run.checkpoint'))
+    time = mocker.patch('time.time')
+    time.return_value = 100
+    writer = checkpoint.create(path, seconds=60)
+    time.return_value = 159
+
+    assert not checkpoint.save(writer, {})
+    assert not os.path.exists(path)
+
+
+def test_checkpoint_of_other_simulation_not_loaded(tmpdir, graph):
+    path = str(tmpdir.join('run.checkpoint'))
+    writer = checkpoint.create(path, seconds=0)
+    checkpoint.save(writer, {'options': 'options'})
+    checkpoint.finish(writer)
+
+    with pytest.raises(ValueError):
+        checkpoint.load(path, 'other options')
+
+
+def test_failed_checkpoint_raised(tmpdir, graph):
+    path = str(tmpdir.join('missing', 'run.checkpoint'))
+    writer = checkpoint.create(path, seconds=0)
+    checkpoint.save(writer, {'options': 'options'})
+
+    with pytest.raises(IOError):
+        checkpoint.finish(writer)
+
+
+def test_closures_of_other_network_not_set(graph):
+    closures = tube.get_closures()
+    closures['closed'] = bytearray(5)
+
+    with pytest.raises(ValueError):
+        tube.set_closures(closures)
@@ -0,0 +1,117 @@
+import pytest
+
+from herdcats import ensemble
+from herdcats import metrics
+
+
+def _summary(found_cats=1, average_turns=2.0, station='foo'):
+    return {
+        'total_cats': 3,
+        'found_cats': found_cats,
+        'unreachable_cats': 0,
+        'average_turns': average_turns,
+        'most_visited_station': station,
+        'least_lucky_owner': 0,
+    }
+
+
+def test_each_run_is_summarised(mocker):
+    mocker.patch('herdcats.tube.reopen_stations')
+    simulate = mocker.patch('herdcats.simulation.simulate')
+    simulate.return_value = ('results', metrics)
+    summarise = mocker.patch('herdcats.ensemble.summarise')
+    summarise.return_value = 'summary'
+
+    summaries = ensemble.simulate(3, 2, jobs=1, engine='array')
+
+    assert summaries == ['summary', 'summary']
+    simulate.assert_called_with(3, engine='array', rng=mocker.ANY)
+    summarise.assert_called_with('results', metrics)
+
+
+def test_each_run_starts_with_stations_reopened(mocker):
+    reopen = mocker.patch('herdcats.tube.reopen_stations')
+    mocker.patch('herdcats.simulation.simulate').return_value = (
+        'results', metrics)
+    mocker.patch('herdcats.ensemble.summarise')
+
+    ensemble.simulate(3, 2, jobs=1)
+
+    assert reopen.call_count == 2
+
+
+def test_runs_get_streams_split_from_seed(mocker):
+    mocker.patch('herdcats.tube.reopen_stations')
+    simulate = mocker.patch('herdcats.simulation.simulate')
+    simulate.return_value = ('results', metrics)
+    mocker.patch('herdcats.ensemble.summarise')
+
+    ensemble.simulate(3, 2, jobs=1, seed=1)
+    ensemble.simulate(3, 2, jobs=1, seed=1)
+
+    draws = [
+        kwargs['rng'].random() for __, kwargs in simulate.call_args_list]
+    assert draws[:2] == draws[2:]
+    assert draws[0] != draws[1]
+
+
+def test_summarise(mocker):
+    calculator = mocker.Mock()
+    calculator.get_total_cats.return_value = 3
+    calculator.get_total_cats_found.return_value = 1
+    calculator.get_total_unreachable.return_value = 0
+    calculator.get_average_turns_to_find_cat.return_value = 2.0
+    calculator.get_most_visited_station.return_value = 'foo'
+    calculator.get_least_lucky_owner.return_value = 0
+
+    assert ensemble.summarise('results', calculator) == _summary()
+
+
+def test_summarise_without_cats_found(mocker):
+    calculator = mocker.Mock()
+    calculator.get_total_cats_found.return_value = 0
+
+    summary = ensemble.summarise('results', calculator)
+
+    assert summary['average_turns'] is None
+    calculator.get_average_turns_to_find_cat.assert_not_called()
+
+
+def test_mean_and_standard_deviation():
+    assert ensemble.get_mean([1, 2, 3, 4]) == 2.5
+    assert ensemble.get_standard_deviation([2, 4, 4, 4, 5, 5, 7, 9]) == (
+        pytest.approx(2.138, abs=0.001))
+    assert ensemble.get_standard_deviation([2]) == 0
+
+
+def test_quantiles_interpolate():
+    assert ensemble.get_quantile([4, 1, 3, 2], 0.5) == 2.5
+    assert ensemble.get_quantile([4, 1, 3, 2], 0) == 1
+    assert ensemble.get_quantile([4, 1, 3, 2], 1) == 4
+    assert ensemble.get_quantile([5], 0.95) == 5
+
+
+def test_summary_prints_spread_across_runs(capsys):
+    ensemble.print_summary([
+        _summary(found_cats=1, average_turns=2.0, station='foo'),
+        _summary(found_cats=3, average_turns=4.0, station='bar'),
+        _summary(found_cats=2, average_turns=6.0, station='foo'),
+    ])
+
+    out, __ = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0] == 'Number of runs: 3'
+    assert lines[1] == 'Total number of cats: 3'
+    assert lines[2] == 'Number of cats found: mean 2.00, std 1.00'
+    assert lines[3].split(', ')[2] == '50% 2.00'
+    assert lines[4] == (
+        'Average number of movements required to find a cat: '
+        'mean 4.00, std 2.00')
+    assert lines[6] == 'The most visited station: foo (2 of 3 runs)'
+
+
+def test_summary_without_cats_found(capsys):
+    ensemble.print_summary([_summary(found_cats=0, average_turns=None)])
+
+    out, __ = capsys.readouterr()
+    assert 'Average number' not in out
@@ -0,0 +1,105 @@
+import json
+
+from cStringIO import StringIO
+
+import pytest
+
+from herdcats import events
+
+from . import utils
+
+
+@pytest.fixture
+def graph(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+
+def test_found_cat_report_includes_owner_id(graph, capsys):
+    events.found_cat(1, 4)
+    out, __ = capsys.readouterr()
+    assert out.startswith('Owner 1')
+
+
+def test_found_cat_report_includes_cat_id(graph, capsys):
+    events.found_cat(1, 4)
+    out, __ = capsys.readouterr()
+    assert 'found cat 1' in out
+
+
+def test_found_cat_report_includes_station_name(graph, capsys):
+    events.found_cat(1, 4)
+    out, __ = capsys.readouterr()
+    assert '- qux station is now closed' in out
+
+
+def test_reports_written_as_text_when_sink_closes(graph):
+    stream = StringIO()
+
+    with events.writing('text', stream):
+        events.found_cat(1, 4)
+        events.found_cat(2, 3)
+
+    assert stream.getvalue() == (
+        'Owner 1 found cat 1 - qux station is now closed.\n'
+        'Owner 2 found cat 2 - baz station is now closed.\n')
+
+
+def test_reports_written_as_json_lines(graph):
+    stream = StringIO()
+
+    with events.writing('json', stream):
+        events.found_cat(1, 4)
+
+    assert map(json.loads, stream.getvalue().splitlines()) == [{
+        'event': 'found_cat',
+        'owner': 1,
+        'station': 4,
+        'station_name': 'qux',
+    }]
+
+
+def test_null_sink_writes_nothing(graph, capsys):
+    with events.writing('null') as sink:
+        events.found_cat(1, 4)
+
+    assert sink['writer'] is None
+    assert capsys.readouterr() == ('', '')
+
+
+def test_reports_handed_to_writer_in_batches(mocker, graph):
+    mocker.patch('herdcats.events.BATCH_SIZE', 2)
+    sink = events.open_sink('text', StringIO())
+    put = mocker.spy(sink['queue'], 'put')
+    mocker.patch('herdcats.events.SINK', sink)
+
+    for owner_id in xrange(5):
+        events.found_cat(owner_id, 4)
+    events.close_sink(sink)
+
+    batches = [args[0] for args, __ in put.call_args_list]
+    assert map(len, batches[:-1]) == [2, 2, 1]
+    assert batches[-1] is None
+    assert len(sink['stream'].getvalue().splitlines()) == 5
+
+
+def test_sink_restored_after_writing(graph):
+    with events.writing('null'):
+        with events.writing('text', StringIO()):
+            pass
+        assert events.SINK['format'] == 'null'
+
+    assert events.SINK is None
+
+
+def test_write_errors_raised_when_sink_closes(graph):
+    stream = StringIO()
+    stream.close()
+
+    with pytest.raises(ValueError):
+        with events.writing('text', stream):
+            events.found_cat(1, 4)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        events.open_sink('xml')
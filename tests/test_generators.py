@@ -0,0 +1,69 @@
+import pytest
+
+from herdcats import generators
+from herdcats import randomness
+from herdcats import tube
+
+
+def _is_connected(graph):
+    offsets = graph['offsets']
+    neighbors = graph['neighbors']
+    reached = set([0])
+    stations = [0]
+    while stations:
+        station = stations.pop()
+        for neighbor in neighbors[offsets[station]:offsets[station + 1]]:
+            if neighbor not in reached:
+                reached.add(neighbor)
+                stations.append(neighbor)
+    return len(reached) == len(graph['ids'])
+
+
+@pytest.mark.parametrize('kind', sorted(generators.KINDS))
+@pytest.mark.parametrize('number', [1, 2, 7, 1000])
+def test_generated_networks_are_connected(kind, number):
+    graph = generators.KINDS[kind](number, randomness.create(0))
+
+    assert list(graph['ids']) == range(number)
+    assert _is_connected(graph)
+
+
+def test_grid():
+    graph = generators.grid(9, randomness.create(0))
+
+    assert list(graph['neighbors'][
+        graph['offsets'][4]:graph['offsets'][5]]) == [1, 3, 5, 7]
+    assert len(graph['neighbors']) == 2 * 12
+
+
+def test_random_regular_has_degree_at_most_given():
+    graph = generators.random_regular(1000, randomness.create(0))
+
+    assert graph['max_degree'] == generators.REGULAR_DEGREE
+
+
+def test_scale_free_has_hubs():
+    graph = generators.scale_free(1000, randomness.create(0))
+
+    assert graph['max_degree'] > 10 * generators.SCALE_FREE_LINKS
+
+
+def test_generated_networks_repeat_with_seed():
+    assert generators.metro(500, randomness.create(1)) == (
+        generators.metro(500, randomness.create(1)))
+
+
+def test_parse():
+    assert generators.parse('scale-free:1000') == ('scale-free', 1000)
+    for value in ('grid', 'grid:', 'grid:0', 'foo:10'):
+        with pytest.raises(ValueError):
+            generators.parse(value)
+
+
+def test_load_uses_generated_network(mocker):
+    mocker.patch('herdcats.tube.GRAPH', None)
+
+    report = generators.load(('ring', 100), seed=0)
+
+    assert report['path'] == 'ring:100'
+    assert report['stations'] == tube.get_number_of_stations() == 100
@@ -5,9 +5,110 @@ def test_simulation_run_N_times(mocker):
     mock_parser = mocker.Mock()
     mock_args = mocker.Mock()
     mock_args.number = 5
+    mock_args.engine = 'dict'
+    mock_args.visited_window = None
+    mock_args.streaming_metrics = False
+    mock_args.history = 'full'
+    mock_args.runs = None
+    mock_args.profile = None
+    mock_args.network = None
+    mock_args.stations = None
+    mock_args.generate = None
+    mock_args.seed = 1
+    mock_args.events = 'json'
     mock_parser.parse_args.return_value = mock_args
     mocker.patch('argparse.ArgumentParser').return_value = mock_parser
     simulation = mocker.patch('herdcats.simulation.run')
     herd_cats.main()
 
-    simulation.assert_called_once_with(5)
+    simulation.assert_called_once_with(
+        5,
+        seed=1,
+        event_format='json',
+        engine='dict',
+        visited_window=None,
+        streaming_metrics=False,
+        history='full',
+    )
+
+
+def test_ensemble_run_with_runs(mocker):
+    mock_parser = mocker.Mock()
+    mock_args = mocker.Mock()
+    mock_args.number = 5
+    mock_args.engine = 'dict'
+    mock_args.visited_window = None
+    mock_args.streaming_metrics = False
+    mock_args.history = 'full'
+    mock_args.runs = 10
+    mock_args.jobs = 2
+    mock_args.profile = None
+    mock_args.network = None
+    mock_args.stations = None
+    mock_args.generate = None
+    mock_args.seed = None
+    mock_parser.parse_args.return_value = mock_args
+    mocker.patch('argparse.ArgumentParser').return_value = mock_parser
+    ensemble = mocker.patch('herdcats.ensemble.run')
+    herd_cats.main()
+
+    ensemble.assert_called_once_with(
+        5,
+        10,
+        jobs=2,
+        seed=None,
+        engine='dict',
+        visited_window=None,
+        streaming_metrics=False,
+        history='full',
+    )
+
+
+def test_network_loaded_before_simulation(mocker):
+    mock_parser = mocker.Mock()
+    mock_args = mocker.Mock()
+    mock_args.number = 5
+    mock_args.engine = 'dict'
+    mock_args.visited_window = None
+    mock_args.streaming_metrics = False
+    mock_args.history = 'full'
+    mock_args.runs = None
+    mock_args.profile = None
+    mock_args.seed = None
+    mock_args.network = 'edges.csv'
+    mock_args.stations = 'names.csv'
+    mock_args.generate = None
+    mock_parser.parse_args.return_value = mock_args
+    mocker.patch('argparse.ArgumentParser').return_value = mock_parser
+    load = mocker.patch('herdcats.network.load')
+    mocker.patch('herdcats.network.print_report')
+    simulation = mocker.patch('herdcats.simulation.run')
+    herd_cats.main()
+
+    load.assert_called_once_with('edges.csv', 'names.csv')
+    assert simulation.called
+
+
+def test_generated_network_loaded_before_simulation(mocker):
+    mock_parser = mocker.Mock()
+    mock_args = mocker.Mock()
+    mock_args.number = 5
+    mock_args.engine = 'dict'
+    mock_args.visited_window = None
+    mock_args.streaming_metrics = False
+    mock_args.history = 'full'
+    mock_args.runs = None
+    mock_args.profile = None
+    mock_args.seed = 3
+    mock_args.network = None
+    mock_args.stations = None
+    mock_args.generate = ('grid', 100)
+    mock_parser.parse_args.return_value = mock_args
+    mocker.patch('argparse.ArgumentParser').return_value = mock_parser
+    load = mocker.patch('herdcats.generators.load')
+    mocker.patch('herdcats.network.print_report')
+    simulation = mocker.patch('herdcats.simulation.run')
+    herd_cats.main()
+
+    load.assert_called_once_with(('grid', 100), 3)
+    assert simulation.called
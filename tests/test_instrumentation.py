@@ -0,0 +1,127 @@
+import pytest
+
+from herdcats import instrumentation
+from herdcats import players
+from herdcats import randomness
+from herdcats import simulation
+from herdcats import tube
+from herdcats import vectorized
+
+from . import utils
+
+
+@pytest.fixture(autouse=True)
+def graph(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    mocker.patch('herdcats.events.found_cat')
+
+
+def test_functions_restored_after_recording():
+    move = players.move
+    get_random_connection = tube.get_random_connection
+
+    with instrumentation.record(instrumentation.create()):
+        assert players.move is not move
+
+    assert players.move is move
+    assert tube.get_random_connection is get_random_connection
+
+
+def test_turns_are_timed(mocker):
+    mocker.patch('herdcats.players.get_searching').return_value = [0, 1]
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.move').side_effect = [[1], []]
+    counters = instrumentation.create()
+
+    with instrumentation.record(counters):
+        simulation.simulate(2)
+
+    assert counters['active_pairs'] == [2, 1]
+    assert len(counters['turn_seconds']) == 2
+
+
+def test_moves_are_counted():
+    counters = instrumentation.create()
+    tube.close_station(3)
+    rng = randomness.create(1)
+
+    with instrumentation.record(counters):
+        tube.get_random_connection(1, rng=rng)
+        tube.get_random_connection(3, rng=rng)
+        tube.get_random_connection(1, exclude_if_possible=[2, 4], rng=rng)
+
+    assert counters['moves_attempted'] == 3
+    assert counters['moves_blocked'] == 1
+    assert counters['forced_revisits'] == 1
+
+
+def test_closures_are_counted_once():
+    counters = instrumentation.create()
+
+    with instrumentation.record(counters):
+        tube.close_station(3)
+        tube.close_station(3)
+
+    assert counters['stations_closed'] == 1
+
+
+def test_retired_owners_are_counted():
+    counters = instrumentation.create()
+    tube.close_station(1)
+    owners_and_cats = [
+        {'owner': [2], 'cat': [4]},
+        {'owner': [3], 'cat': [3]},
+        {'owner': [1], 'cat': [2]},
+    ]
+
+    with instrumentation.record(counters):
+        players.retire_unreachable(owners_and_cats, [0, 1, 2])
+
+    # bar and qux swap with each other every move and foo is closed
+    assert counters['pairs_retired'] == 2
+
+
+def test_array_moves_are_counted(mocker):
+    numpy = pytest.importorskip('numpy')
+    state = vectorized.create(2, rng=randomness.create(1))
+    state['owner'][:] = [0, 2]
+    # The first owner has visited every station they could move to
+    for station in (1, 3):
+        vectorized._mark_visited(
+            state, numpy.array([0]), numpy.array([station]))
+    vectorized._close_station(state, 2)
+    counters = instrumentation.create()
+
+    with instrumentation.record(counters):
+        vectorized._get_random_connections(
+            state, state['owner'], visited_by=numpy.arange(2))
+
+    assert counters['moves_attempted'] == 2
+    assert counters['moves_blocked'] == 1
+    assert counters['forced_revisits'] == 1
+
+
+def test_counters_printed(capsys):
+    counters = instrumentation.create()
+    counters['turn_seconds'] = [1.0, 3.0]
+    counters['active_pairs'] = [4, 2]
+
+    instrumentation.print_counters(counters)
+
+    out, __ = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0] == 'Turns: 2'
+    assert lines[1] == 'Seconds per turn: mean 2.000000, max 3.000000'
+    assert lines[2] == 'Owners searching: 4 in first turn, 2 in last turn'
+
+
+def test_profile_saved(tmpdir, capsys):
+    path = str(tmpdir.join('herd_cats.prof'))
+
+    instrumentation.profile(
+        path, simulation.simulate, 2, rng=randomness.create(1), max_turns=3)
+
+    out, __ = capsys.readouterr()
+    assert tmpdir.join('herd_cats.prof').check()
+    assert 'Moves attempted: ' in out
+    assert 'simulate' in out
@@ -1,8 +1,9 @@
-from collections import Counter
-
 import pytest
 
 from herdcats import metrics
+from herdcats import tube
+
+from . import utils
 
 
 def test_get_total_cats():
@@ -30,6 +31,12 @@ def test_get_total_cats_found():
     assert metrics.get_total_cats_found(owners_and_cats) == 2
 
 
+def test_get_total_unreachable():
+    owners_and_cats = [{'unreachable': True}, {}, {'unreachable': True}]
+
+    assert metrics.get_total_unreachable(owners_and_cats) == 2
+
+
 def test_get_average_turns_to_find_cat():
     owners_and_cats = [
         {
@@ -57,8 +64,8 @@ def test_get_average_turns_to_find_cat_raises_exception_if_none_found():
 
 def test_get_most_visited_station(mocker):
     mocker.patch(
-        'herdcats.tube.STATIONS',
-        {5: {'name': 'foo'}}
+        'herdcats.tube.GRAPH',
+        tube._build_graph({5: {'name': 'foo', 'is_closed': False}}, {})
     )
     owners_and_cats = [
         {
@@ -78,8 +85,7 @@ def test_get_most_visited_station(mocker):
 
 def test_get_least_lucky_owner(mocker):
     mocker.patch(
-        'herdcats.players.get_number_of_times_owner_one_hop_away',
-    ).side_effect = [1, 2, 3]
+        'herdcats.metrics._get_one_hop_counts').return_value = [1, 2, 3]
     owners_and_cats = [None] * 3
 
     least_lucky = metrics.get_least_lucky_owner(owners_and_cats)
@@ -87,8 +93,40 @@ def test_get_least_lucky_owner(mocker):
     assert least_lucky == 2
 
 
-def test_get_most_common_item_from_counter_result():
-    count = Counter('aabc')
-    common = count.most_common(1)
+def test_get_most_visited_station_picks_lowest_station_on_a_tie(mocker):
+    mocker.patch('herdcats.tube.get_station_name').side_effect = str
+    owners_and_cats = [
+        {
+            'owner': [9, 4],
+            'cat': [2, 9]
+        },
+        {
+            'owner': [4],
+            'cat': [2]
+        },
+    ]
+
+    assert metrics.get_most_visited_station(owners_and_cats) == '2'
+
+
+def test_get_least_lucky_owner_picks_first_owner_on_a_tie(mocker):
+    mocker.patch(
+        'herdcats.metrics._get_one_hop_counts').return_value = [1, 3, 3]
+    owners_and_cats = [None] * 3
+
+    assert metrics.get_least_lucky_owner(owners_and_cats) == 1
+
+
+@pytest.mark.parametrize('numpy_installed', [True, False])
+def test_one_hop_counts_compare_journeys_step_by_step(mocker,
+                                                      numpy_installed):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    if not numpy_installed:
+        mocker.patch('herdcats.vectorized.numpy', None)
+    owners_and_cats = [
+        {'owner': [1, 2, 4], 'cat': [3, 4]},
+        {'owner': [3], 'cat': [4, 2, 1]},
+        {'owner': [2, 1, 4, 2], 'cat': [1, 4, 1, 3]},
+    ]
 
-    assert metrics._get_common_item(common) == 'a'
+    assert metrics._get_one_hop_counts(owners_and_cats) == [2, 0, 3]
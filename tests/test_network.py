@@ -0,0 +1,69 @@
+from cStringIO import StringIO
+
+import pytest
+
+from herdcats import network
+from herdcats import tube
+
+from . import utils
+
+
+def test_read_edges_skips_header_comments_and_loops():
+    f = StringIO('from,to,line\n# comment\n1,2,x\n3,3,y\n2 4 z\n')
+
+    starts, ends = network.read_edges(f)
+
+    assert list(starts) == [1, 2]
+    assert list(ends) == [2, 4]
+
+
+def test_read_edges_a_chunk_at_a_time(mocker):
+    mocker.patch('herdcats.network.CHUNK_SIZE', 3)
+    f = StringIO('10,20\n20,30\n30,10\n')
+
+    starts, ends = network.read_edges(f)
+
+    assert list(starts) == [10, 20, 30]
+    assert list(ends) == [20, 30, 10]
+
+
+def test_read_edges_rejects_ragged_lines():
+    with pytest.raises(ValueError):
+        network.read_edges(StringIO('1,2\n2,3,4\n'))
+
+
+def test_build_matches_tube_graph(tmpdir):
+    connections = utils.get_connections()
+    tmpdir.join('edges.csv').write(''.join(
+        '%d,%d\n' % (station, other)
+        for station in connections for other in connections[station]))
+    tmpdir.join('names.csv').write(''.join(
+        '%d,%s\n' % (station_id, station['name'])
+        for station_id, station in utils.get_stations().items()))
+
+    graph = network.build(
+        str(tmpdir.join('edges.csv')), str(tmpdir.join('names.csv')))
+
+    assert graph == utils.get_graph()
+
+
+def test_build_names_stations_by_id_by_default(tmpdir):
+    tmpdir.join('edges.csv').write('5,7\n')
+
+    graph = network.build(str(tmpdir.join('edges.csv')))
+
+    assert list(graph['ids']) == [5, 7]
+    assert graph['names'] == '57'
+
+
+def test_load_uses_network_and_saves_it(mocker, tmpdir):
+    mocker.patch('herdcats.tube.GRAPH', None)
+    tmpdir.join('edges.csv').write('1,2\n2,3\n')
+
+    report = network.load(str(tmpdir.join('edges.csv')))
+
+    assert report['stations'] == 3
+    assert report['connections'] == 2
+    assert report['graph_bytes'] > 0
+    assert tube.are_connected(3, 2)
+    assert tmpdir.join('edges.csv.graph').check()
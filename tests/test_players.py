@@ -4,6 +4,9 @@ from . import utils
 
 
 def test_N_owers_and_cats_are_created(mocker):
+    mocker.patch(
+        'herdcats.tube.get_random_station_pairs'
+    ).return_value = ([1, 2, 3], [2, 3, 1])
     mocker.patch('herdcats.players._create')
 
     owner_and_cats = players.create(3)
@@ -11,42 +14,32 @@ def test_N_owers_and_cats_are_created(mocker):
     assert len(owner_and_cats) == 3
 
 
-def test_new_owner_placed_at_random_station(mocker):
-    random_station = mocker.patch(
-        'herdcats.tube.get_random_station')
-    random_station.side_effect = [1, 2]
-
-    owner_and_cat = players._create()
-
-    assert random_station.call_args_list[0] == ()
-    assert owner_and_cat['owner'] == [1]
-
-
-def test_new_cat_placed_at_random_station(mocker):
-    random_station = mocker.patch('herdcats.tube.get_random_station')
-    random_station.side_effect = [1, 2]
+def test_owners_and_cats_placed_at_random_stations_together(mocker):
+    random_pairs = mocker.patch('herdcats.tube.get_random_station_pairs')
+    random_pairs.return_value = ([1, 3], [2, 4])
 
-    owner_and_cat = players._create()
+    owner_and_cats = players.create(2, rng='rng')
 
-    assert random_station.call_args_list[1] == ({'exclude': [1]},)
-    assert owner_and_cat['cat'] == [2]
+    random_pairs.assert_called_once_with(2, 'rng')
+    assert [o['owner'] for o in owner_and_cats] == [[1], [3]]
+    assert [o['cat'] for o in owner_and_cats] == [[2], [4]]
 
 
 def test_each_owner_and_cat_attempt_to_move_each_turn(mocker):
     mocker.patch('herdcats.players._is_cat_found_this_turn')
     mocker.patch('herdcats.players._get_current_stations')
-    mocker.patch('herdcats.players._print_found_cat')
+    mocker.patch('herdcats.events.found_cat')
     mocker.patch('herdcats.tube.close_station')
     move = mocker.patch('herdcats.players._attempt_move')
     owner_and_cats = 'abc'
     turn = 1
 
-    players.move(owner_and_cats, turn)
+    players.move(owner_and_cats, turn, rng='rng')
 
     assert move.call_args_list == [
-        (('a',),),
-        (('b',),),
-        (('c',),),
+        (('a', 'rng'),),
+        (('b', 'rng'),),
+        (('c', 'rng'),),
     ]
 
 
@@ -82,9 +75,9 @@ def test_owner_move_attempted_if_cat_not_found(mocker):
     )
     owner_and_cat = 'owner_and_cat'
 
-    players._attempt_move(owner_and_cat)
+    players._attempt_move(owner_and_cat, 'rng')
 
-    move_owner.assert_called_once_with(owner_and_cat)
+    move_owner.assert_called_once_with(owner_and_cat, 'rng')
 
 
 def test_cat_move_attempted_if_cat_not_found(mocker):
@@ -99,9 +92,9 @@ def test_cat_move_attempted_if_cat_not_found(mocker):
     move_cat.return_value = 'owner_and_cat_moved'
     owner_and_cat = 'owner_and_cat'
 
-    players._attempt_move(owner_and_cat)
+    players._attempt_move(owner_and_cat, 'rng')
 
-    move_cat.assert_called_once_with(owner_and_cat)
+    move_cat.assert_called_once_with(owner_and_cat, 'rng')
 
 
 def test_owner_attempts_to_move_to_conneced_station(mocker):
@@ -111,19 +104,21 @@ def test_owner_attempts_to_move_to_conneced_station(mocker):
     get_current_stations.return_value = 1, 2
     mocker.patch(
         'herdcats.players._get_visisted_stations'
-    ).return_value = []
+    ).return_value = set()
     get_connection = mocker.patch(
         'herdcats.tube.get_random_connection'
     )
+    get_connection.return_value = None
     owner_and_cat = {
         'owner': [],
         'cat': []
     }
 
-    players._attempt_owner_move(owner_and_cat)
+    players._attempt_owner_move(owner_and_cat, 'rng')
 
     assert get_current_stations.call_args_list[0][0][0] is owner_and_cat
-    get_connection.assert_called_once_with(1, exclude_if_possible=[])
+    get_connection.assert_called_once_with(
+        1, exclude_if_possible=set(), rng='rng')
 
 
 def test_owner_attempts_to_avoid_visited_stations(mocker):
@@ -133,20 +128,21 @@ def test_owner_attempts_to_avoid_visited_stations(mocker):
     get_visited = mocker.patch(
         'herdcats.players._get_visisted_stations'
     )
-    get_visited.return_value = [1, 2]
+    get_visited.return_value = set([1, 2])
     get_connection = mocker.patch(
         'herdcats.tube.get_random_connection'
     )
+    get_connection.return_value = None
     owner_and_cat = {
         'owner': [],
         'cat': []
     }
 
-    players._attempt_owner_move(owner_and_cat)
+    players._attempt_owner_move(owner_and_cat, 'rng')
 
     assert get_visited.call_args_list[0][0][0] is owner_and_cat
     get_connection.assert_called_once_with(
-        1, exclude_if_possible=[1, 2])
+        1, exclude_if_possible=set([1, 2]), rng='rng')
 
 
 def test_owner_moves_to_available_connected_station(mocker):
@@ -205,10 +201,10 @@ def test_cat_attempts_to_move_to_conneced_station(mocker):
         'cat': []
     }
 
-    players._attempt_cat_move(owner_and_cat)
+    players._attempt_cat_move(owner_and_cat, 'rng')
 
     assert get_current_stations.call_args_list[0][0][0] is owner_and_cat
-    get_connection.assert_called_once_with(2)
+    get_connection.assert_called_once_with(2, rng='rng')
 
 
 def test_cat_moves_to_available_connected_station(mocker):
@@ -257,6 +253,7 @@ def test_each_cat_found_this_turn_is_handled(mocker):
         'herdcats.players._is_cat_found_this_turn'
     ).side_effect = [True, False, True]
     handle = mocker.patch('herdcats.players._handle_found_cat')
+    mocker.patch('herdcats.players.retire_unreachable')
     owner_and_cats = 'abc'
     turn = 1
 
@@ -300,7 +297,7 @@ def test_cat_is_not_found_this_turn_if_both_not_at_same_station(mocker):
 
 
 def test_station_is_closed_when_cat_found(mocker):
-    mocker.patch('herdcats.players._print_found_cat')
+    mocker.patch('herdcats.events.found_cat')
     get_current_stations = mocker.patch(
         'herdcats.players._get_current_stations')
     get_current_stations.return_value = ('station',)
@@ -313,7 +310,7 @@ def test_station_is_closed_when_cat_found(mocker):
 
 
 def test_cat_reported_when_found(mocker):
-    report = mocker.patch('herdcats.players._print_found_cat')
+    report = mocker.patch('herdcats.events.found_cat')
     mocker.patch(
         'herdcats.players._get_current_stations'
     ).return_value = ('station',)
@@ -409,25 +406,152 @@ def test_get_current_stations_returns_cat_station():
 def test_get_current_visited_stations():
     owner_and_cat = {
         'owner': [1, 2],
+        'visited': set([1, 2]),
     }
 
-    assert players._get_visisted_stations(owner_and_cat) == [1, 2]
+    assert players._get_visisted_stations(owner_and_cat) == set([1, 2])
+
+
+def test_new_owner_has_visited_their_first_station(mocker):
+    owner_and_cat = players._create(1, 2)
+
+    assert owner_and_cat['visited'] == set([1])
 
 
-def test_found_cat_report_includes_owner_id(capsys):
-    players._print_found_cat(1, 4)
-    out, __ = capsys.readouterr()
-    assert out.startswith('Owner 1')
+def test_owner_move_marks_station_visited(mocker):
+    mocker.patch(
+        'herdcats.tube.get_random_connection'
+    ).return_value = 3
+    owner_and_cat = {
+        'owner': [1],
+        'cat': [2],
+        'visited': set([1]),
+    }
 
+    players._attempt_owner_move(owner_and_cat)
 
-def test_found_cat_report_includes_cat_id(capsys):
-    players._print_found_cat(1, 4)
-    out, __ = capsys.readouterr()
-    assert 'found cat 1' in out
+    assert owner_and_cat['visited'] == set([1, 3])
+
+
+def test_owner_only_remembers_visited_window(mocker):
+    owner_and_cat = players._create(1, 2, visited_window=2)
+
+    for station in [3, 1, 4]:
+        players._mark_visited(owner_and_cat, station)
+
+    assert owner_and_cat['visited'] == {1: 1, 4: 1}
+
+
+def test_station_stays_visited_while_in_window(mocker):
+    owner_and_cat = players._create(1, 2, visited_window=3)
+
+    for station in [3, 1, 4]:
+        players._mark_visited(owner_and_cat, station)
+
+    assert owner_and_cat['visited'] == {3: 1, 1: 1, 4: 1}
+
+
+def test_owner_with_empty_visited_window_remembers_nothing(mocker):
+    owner_and_cat = players._create(1, 2, visited_window=0)
+
+    players._mark_visited(owner_and_cat, 3)
+
+    assert not owner_and_cat['visited']
+
+
+def test_only_owners_still_searching_move(mocker):
+    mocker.patch(
+        'herdcats.players._is_cat_found_this_turn'
+    ).return_value = False
+    move = mocker.patch('herdcats.players._attempt_move')
+    owner_and_cats = 'abc'
+
+    players.move(owner_and_cats, 1, [0, 2], rng='rng')
+
+    assert move.call_args_list == [
+        (('a', 'rng'),),
+        (('c', 'rng'),),
+    ]
+
+
+def test_owners_who_find_their_cat_stop_searching(mocker):
+    mocker.patch('herdcats.players._attempt_move')
+    mocker.patch(
+        'herdcats.players._is_cat_found_this_turn'
+    ).side_effect = [True, False, True]
+    mocker.patch('herdcats.players._handle_found_cat')
+    mocker.patch('herdcats.players.retire_unreachable')
+    searching = [0, 1, 2]
+
+    still_searching = players.move('abc', 1, searching)
+
+    assert still_searching is searching
+    assert searching == [1]
+
+
+def test_get_searching(mocker):
+    mocker.patch(
+        'herdcats.players._is_cat_found'
+    ).side_effect = [True, False, True, False]
+
+    assert players.get_searching([{}, {}, {}, {}]) == [1, 3]
+
+
+def test_moves_are_accumulated_if_given_an_accumulator(mocker):
+    mocker.patch('herdcats.players._attempt_move')
+    mocker.patch(
+        'herdcats.players._is_cat_found_this_turn'
+    ).side_effect = [False, True]
+    mocker.patch('herdcats.players._handle_found_cat')
+    mocker.patch('herdcats.players.retire_unreachable')
+    record = mocker.patch('herdcats.streaming.record')
+
+    players.move('ab', 1, [0, 1], accumulator='accumulator')
+
+    assert record.call_args_list == [
+        (('accumulator', 0, 'a', False),),
+        (('accumulator', 1, 'b', True),),
+    ]
+
+
+def test_journeys_keep_given_history(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    owner_and_cat = players._create(1, 2, history='none')
+    owner_and_cat['owner'].append(3)
+
+    assert list(owner_and_cat['owner']) == [3]
+    assert len(owner_and_cat['owner']) == 2
+
+
+def test_owners_who_cant_reach_their_cat_are_retired(mocker):
+    mocker.patch('herdcats.tube.can_meet').side_effect = [True, False]
+    record = mocker.patch('herdcats.streaming.record_unreachable')
+    owners_and_cats = [
+        {'owner': [1], 'cat': [2]},
+        {'owner': [3], 'cat': [4]},
+    ]
+    searching = [0, 1]
+
+    still_searching = players.retire_unreachable(
+        owners_and_cats, searching, accumulator='accumulator')
+
+    assert still_searching is searching
+    assert searching == [0]
+    assert owners_and_cats[1]['unreachable']
+    assert players.get_searching(owners_and_cats) == [0]
+    record.assert_called_once_with('accumulator')
+
+
+def test_unreachable_owners_retired_once_a_cat_is_found(mocker):
+    mocker.patch('herdcats.players._attempt_move')
+    mocker.patch(
+        'herdcats.players._is_cat_found_this_turn'
+    ).side_effect = [True, False, False, False]
+    mocker.patch('herdcats.players._handle_found_cat')
+    retire = mocker.patch('herdcats.players.retire_unreachable')
 
+    players.move('ab', 1, [0, 1])
+    players.move('ab', 2, [1])
 
-def test_found_cat_report_includes_station_name(mocker, capsys):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    players._print_found_cat(1, 4)
-    out, __ = capsys.readouterr()
-    assert '- qux station is now closed' in out
+    retire.assert_called_once_with('ab', [1], None)
@@ -0,0 +1,104 @@
+import cPickle as pickle
+
+from array import array
+from collections import Counter
+
+from herdcats import randomness
+
+
+def _draws(rng):
+    return [rng.random() for __ in xrange(3)]
+
+
+def test_same_seed_gives_same_stream():
+    assert _draws(randomness.create(1)) == _draws(randomness.create(1))
+    assert _draws(randomness.create(1)) != _draws(randomness.create(2))
+
+
+def test_spawned_streams_are_reproducible():
+    children = randomness.spawn(randomness.create(1), 3)
+    again = randomness.spawn(randomness.create(1), 3)
+
+    assert map(_draws, children) == map(_draws, again)
+
+
+def test_spawned_streams_differ():
+    children = randomness.spawn(randomness.create(1), 3)
+
+    draws = map(_draws, children)
+    assert len(set(map(tuple, draws))) == 3
+
+
+def test_spawned_streams_dont_depend_on_how_many():
+    rng = randomness.create(1)
+    two = randomness.spawn(rng, 2)
+    rng = randomness.create(1)
+    three = randomness.spawn(rng, 3)
+
+    assert map(_draws, two) == map(_draws, three[:2])
+
+
+def test_randbelow_is_uniform():
+    rng = randomness.create(1)
+
+    counts = Counter(rng.randbelow(3) for __ in xrange(30000))
+
+    assert sorted(counts) == [0, 1, 2]
+    assert max(counts.values()) - min(counts.values()) < 600
+
+
+def test_randbelow_rejects_words_past_last_multiple():
+    rng = randomness.create(1)
+    rng._block = array('H', [randomness.WORD_LIMIT - 1, 5])
+
+    assert rng.randbelow(3) == 2
+
+
+def test_randbelow_beyond_word_limit():
+    rng = randomness.create(1)
+
+    assert 0 <= rng.randbelow(10 * randomness.WORD_LIMIT) < (
+        10 * randomness.WORD_LIMIT)
+
+
+def test_randbelow_many_repeats_randbelow():
+    rng = randomness.create(1)
+    again = randomness.create(1)
+
+    values = rng.randbelow_many(3, 10000)
+
+    assert list(values) == [again.randbelow(3) for __ in xrange(10000)]
+    assert rng.randbelow(3) == again.randbelow(3)
+
+
+def test_randbelow_many_beyond_word_limit_is_uniform():
+    n = 3 * randomness.WORD_LIMIT
+    rng = randomness.create(1)
+
+    values = rng.randbelow_many(n, 30000)
+
+    assert len(values) == 30000
+    assert 0 <= min(values) and max(values) < n
+    counts = Counter(value // randomness.WORD_LIMIT for value in values)
+    assert max(counts.values()) - min(counts.values()) < 600
+
+
+def test_blocks_restart_when_reseeded():
+    rng = randomness.create(1)
+    first = _draws_below(rng)
+    rng.seed(1)
+
+    assert _draws_below(rng) == first
+
+
+def _draws_below(rng):
+    return [rng.randbelow(10) for __ in xrange(3)]
+
+
+def test_pickled_stream_carries_on_from_same_word():
+    rng = randomness.create(1)
+    rng.randbelow(10)
+
+    again = pickle.loads(pickle.dumps(rng, pickle.HIGHEST_PROTOCOL))
+
+    assert _draws_below(again) == _draws_below(rng)
@@ -84,10 +84,47 @@ def test_summary_prints_least_lucky_owner(mocker, capsys):
         'herdcats.metrics.get_least_lucky_owner'
     )
     least_lucky.return_value = 1
-    owners_and_cats = ['owners_and_cats']
+    owners_and_cats = [{}]
 
     reporting.print_summary(owners_and_cats)
     out, __ = capsys.readouterr()
 
     least_lucky.assert_called_once_with(owners_and_cats)
     assert 'least lucky owner: 1' in out
+
+
+def test_summary_printed_from_another_calculator(mocker, capsys):
+    calculator = mocker.Mock()
+    calculator.get_total_cats.return_value = 3
+    calculator.get_total_cats_found.return_value = 2
+    calculator.get_total_unreachable.return_value = 0
+    calculator.get_average_turns_to_find_cat.return_value = 4.5
+    calculator.get_most_visited_station.return_value = 'foo'
+    calculator.get_least_lucky_owner.return_value = 1
+    get_total = mocker.patch('herdcats.metrics.get_total_cats')
+
+    reporting.print_summary('accumulator', calculator=calculator)
+
+    out, __ = capsys.readouterr()
+    get_total.assert_not_called()
+    calculator.get_total_cats.assert_called_once_with('accumulator')
+    assert out.splitlines() == [
+        'Total number of cats: 3',
+        'Number of cats found: 2',
+        'Average number of movements required to find a cat: 4',
+        'The most visited station: foo',
+        'The least lucky owner: 1',
+    ]
+
+
+def test_summary_prints_owners_who_cant_reach_their_cat(mocker, capsys):
+    mocker.patch('herdcats.metrics.get_least_lucky_owner')
+    mocker.patch('herdcats.metrics.get_total_cats')
+    mocker.patch('herdcats.metrics.get_total_cats_found').return_value = 0
+    mocker.patch('herdcats.metrics.get_total_unreachable').return_value = 2
+
+    reporting.print_summary([])
+
+    out, __ = capsys.readouterr()
+    assert out.splitlines()[2] == (
+        'Number of owners who can no longer reach their cat: 2')
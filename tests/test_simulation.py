@@ -1,60 +1,285 @@
+import os
+
+import pytest
+
+from herdcats import generators
+from herdcats import randomness
 from herdcats import simulation
+from herdcats import tube
+
+from . import utils
 
 
-def test_owners_and_cats_are_created(mocker):
-    mocker.patch('herdcats.players.are_all_cats_found')
+@pytest.fixture
+def reachable(mocker):
+    """Lets every owner searching at the start carry on searching."""
+    for engine in ('players', 'vectorized'):
+        mocker.patch(
+            'herdcats.%s.retire_unreachable' % engine
+        ).side_effect = lambda owners_and_cats, searching, accumulator: (
+            searching)
+
+
+def test_owners_and_cats_are_created(mocker, reachable):
+    mocker.patch('herdcats.players.get_searching').return_value = []
     mocker.patch('herdcats.players.move')
     mocker.patch('herdcats.reporting.print_summary')
     create = mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.randomness.create').return_value = 'rng'
 
     simulation.run(3)
 
-    create.assert_called_once_with(3)
+    create.assert_called_once_with(
+        3, visited_window=None, history='full', rng='rng')
 
 
-def test_players_attempt_to_move_on_each_turn(mocker):
+def test_players_attempt_to_move_on_each_turn(mocker, reachable):
     mocker.patch('herdcats.simulation.MAX_TURNS', 2)
     mocker.patch('herdcats.players.create').return_value = 'players'
-    mocker.patch('herdcats.players.are_all_cats_found').return_value = False
+    mocker.patch('herdcats.players.get_searching').return_value = [0, 1]
     mocker.patch('herdcats.reporting.print_summary')
     move = mocker.patch('herdcats.players.move')
+    move.return_value = [1]
+    mocker.patch('herdcats.randomness.create').return_value = 'rng'
 
     simulation.run(3)
 
-    assert move.call_args_list == [(('players', 1),), (('players', 2),)]
+    assert move.call_args_list == [
+        (('players', 1, [0, 1]), {'accumulator': None, 'rng': 'rng'}),
+        (('players', 2, [1]), {'accumulator': None, 'rng': 'rng'}),
+    ]
 
 
-def test_simulation_stops_after_MAX_TURNS_turns_if_all_cats_not_found(mocker):
+def test_simulation_stops_after_MAX_TURNS_turns_if_all_cats_not_found(
+        mocker, reachable):
     mocker.patch('herdcats.simulation.MAX_TURNS', 5)
     mocker.patch('herdcats.players.create')
-    mocker.patch('herdcats.players.are_all_cats_found').return_value = False
+    mocker.patch('herdcats.players.get_searching').return_value = [0]
     mocker.patch('herdcats.reporting.print_summary')
     move = mocker.patch('herdcats.players.move')
+    move.return_value = [0]
 
     simulation.run(3)
 
     assert move.call_count == 5
 
 
-def test_simulation_stops_if_all_cats_found(mocker):
+def test_simulation_stops_if_all_cats_found(mocker, reachable):
     mocker.patch('herdcats.players.create')
-    mocker.patch('herdcats.players.are_all_cats_found').side_effect = [
-        False, False, True]
+    mocker.patch('herdcats.players.get_searching').return_value = [0, 1]
     mocker.patch('herdcats.reporting.print_summary')
     move = mocker.patch('herdcats.players.move')
+    move.side_effect = [[1], []]
 
     simulation.run(3)
 
     assert move.call_count == 2
 
 
-def test_summary_report_printed_after_simulation(mocker):
+def test_simulation_doesnt_move_if_all_cats_found_at_start(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = []
+    mocker.patch('herdcats.reporting.print_summary')
+    move = mocker.patch('herdcats.players.move')
+
+    simulation.run(3)
+
+    move.assert_not_called()
+
+
+def test_summary_report_printed_after_simulation(mocker, reachable):
     mocker.patch('herdcats.simulation.MAX_TURNS', 5)
     mocker.patch('herdcats.players.create').return_value = 'owners_and_cats'
-    mocker.patch('herdcats.players.are_all_cats_found').return_value = False
-    mocker.patch('herdcats.players.move')
+    mocker.patch('herdcats.players.get_searching').return_value = [0]
+    mocker.patch('herdcats.players.move').return_value = [0]
     report = mocker.patch('herdcats.reporting.print_summary')
 
     simulation.run(3)
 
-    report.assert_called_once_with('owners_and_cats')
+    report.assert_called_once_with(
+        'owners_and_cats', calculator=simulation.metrics)
+
+
+def test_array_engine_results_are_reported_as_owners_and_cats(mocker, reachable):
+    mocker.patch('herdcats.vectorized.create').return_value = 'arrays'
+    mocker.patch('herdcats.vectorized.get_searching').return_value = [0]
+    move = mocker.patch('herdcats.vectorized.move')
+    move.return_value = []
+    mocker.patch(
+        'herdcats.vectorized.get_owners_and_cats'
+    ).return_value = 'owners_and_cats'
+    report = mocker.patch('herdcats.reporting.print_summary')
+    mocker.patch('herdcats.randomness.create').return_value = 'rng'
+
+    simulation.run(3, engine='array')
+
+    move.assert_called_once_with(
+        'arrays', 1, [0], accumulator=None, rng='rng')
+    report.assert_called_once_with(
+        'owners_and_cats', calculator=simulation.metrics)
+
+
+def test_streaming_metrics_are_accumulated_each_turn(mocker, reachable):
+    mocker.patch('herdcats.players.create').return_value = 'owners_and_cats'
+    mocker.patch('herdcats.players.get_searching').return_value = [0]
+    move = mocker.patch('herdcats.players.move')
+    move.return_value = []
+    create_accumulator = mocker.patch('herdcats.streaming.create')
+    create_accumulator.return_value = 'accumulator'
+    mocker.patch('herdcats.reporting.print_summary')
+
+    mocker.patch('herdcats.randomness.create').return_value = 'rng'
+
+    simulation.run(3, streaming_metrics=True)
+
+    create_accumulator.assert_called_once_with('owners_and_cats')
+    move.assert_called_once_with(
+        'owners_and_cats', 1, [0], accumulator='accumulator', rng='rng')
+
+
+def test_streaming_metrics_summary_reported_from_accumulator(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = []
+    mocker.patch('herdcats.streaming.create').return_value = 'accumulator'
+    report = mocker.patch('herdcats.reporting.print_summary')
+
+    simulation.run(3, streaming_metrics=True)
+
+    report.assert_called_once_with(
+        'accumulator', calculator=simulation.streaming)
+
+
+def test_streaming_metrics_used_without_full_history(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = []
+    mocker.patch('herdcats.streaming.create').return_value = 'accumulator'
+    report = mocker.patch('herdcats.reporting.print_summary')
+
+    simulation.run(3, history=10)
+
+    report.assert_called_once_with(
+        'accumulator', calculator=simulation.streaming)
+
+
+def test_array_engine_creates_its_own_accumulator(mocker, reachable):
+    mocker.patch('herdcats.vectorized.create').return_value = 'arrays'
+    mocker.patch('herdcats.vectorized.get_searching').return_value = []
+    create_accumulator = mocker.patch(
+        'herdcats.vectorized.create_accumulator')
+    mocker.patch('herdcats.reporting.print_summary')
+
+    simulation.run(3, engine='array', streaming_metrics=True)
+
+    create_accumulator.assert_called_once_with('arrays')
+
+
+def test_simulation_random_choices_are_seeded(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = []
+    mocker.patch('herdcats.reporting.print_summary')
+    create_rng = mocker.patch('herdcats.randomness.create')
+
+    simulation.run(3, seed=5)
+
+    create_rng.assert_called_once_with(5)
+
+
+def test_same_rng_seed_repeats_simulation(mocker):
+    mocker.patch('herdcats.simulation.MAX_TURNS', 20)
+    mocker.patch('herdcats.events.found_cat')
+    journeys = []
+    for __ in xrange(2):
+        mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+        owners_and_cats, __ = simulation.simulate(
+            5, rng=randomness.create(1))
+        journeys.append([
+            (list(p['owner']), list(p['cat'])) for p in owners_and_cats])
+
+    assert journeys[0] == journeys[1]
+
+
+def test_simulation_stops_after_max_turns_if_given(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = [0]
+    move = mocker.patch('herdcats.players.move')
+    move.return_value = [0]
+
+    simulation.simulate(3, max_turns=2)
+
+    assert move.call_count == 2
+
+
+def test_on_turn_called_after_each_turn(mocker, reachable):
+    mocker.patch('herdcats.players.create')
+    mocker.patch('herdcats.players.get_searching').return_value = [0, 1]
+    mocker.patch('herdcats.players.move').side_effect = [[1], []]
+    on_turn = mocker.Mock()
+
+    simulation.simulate(3, on_turn=on_turn)
+
+    assert on_turn.call_args_list == [((1, 2),), ((2, 1),)]
+
+
+def test_owners_who_cant_reach_their_cat_at_start_never_move(mocker):
+    graph = utils.get_graph()
+    tube._close_station(graph, graph['index'][1])
+    mocker.patch('herdcats.tube.GRAPH', graph)
+    mocker.patch(
+        'herdcats.tube.get_random_station_pairs'
+    ).return_value = ([1], [2])
+    move = mocker.patch('herdcats.players.move')
+
+    results, __ = simulation.simulate(1)
+
+    move.assert_not_called()
+    assert results[0]['unreachable']
+
+
+@pytest.mark.parametrize('engine', sorted(simulation.ENGINES))
+def test_simulation_stops_once_no_owner_can_find_their_cat(mocker, engine):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    mocker.patch('herdcats.events.found_cat')
+    on_turn = mocker.Mock()
+
+    results, calculator = simulation.simulate(
+        3, engine=engine, rng=randomness.create(0), on_turn=on_turn)
+
+    assert on_turn.call_count < 100
+    assert (calculator.get_total_cats_found(results) +
+            calculator.get_total_unreachable(results)) == 3
+
+
+def test_found_cats_all_reported_before_summary(mocker, capsys):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    simulation.run(3, seed=0, event_format='json')
+
+    out, __ = capsys.readouterr()
+    lines = out.splitlines()
+    reports = [line for line in lines if line.startswith('{')]
+    assert reports and lines[:len(reports)] == reports
+
+
+@pytest.mark.parametrize('engine', sorted(simulation.ENGINES))
+def test_resumed_simulation_carries_on_exactly(
+        mocker, monkeypatch, tmpdir, engine):
+    mocker.patch('herdcats.tube.GRAPH', generators.grid(100, None))
+    mocker.patch('herdcats.events.found_cat')
+    expected, __ = simulation.simulate(
+        20, engine=engine, rng=randomness.create(2))
+    tube.reopen_stations()
+    path = str(tmpdir.join('run.checkpoint'))
+    # Checkpoint every turn, waiting for each, so the last is after some
+    # cats have been found
+    mocker.patch('herdcats.checkpoint.CHECKPOINT_SECONDS', 0)
+    monkeypatch.delattr(os, 'fork')
+    simulation.simulate(
+        20, engine=engine, rng=randomness.create(2), max_turns=50,
+        checkpoint_path=path)
+    # As if carrying on in a new process
+    mocker.patch('herdcats.tube.GRAPH', generators.grid(100, None))
+
+    results, __ = simulation.simulate(
+        20, engine=engine, checkpoint_path=path, resume=True)
+
+    assert results == expected
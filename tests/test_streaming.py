@@ -0,0 +1,149 @@
+from collections import Counter
+
+import pytest
+
+from herdcats import metrics
+from herdcats import streaming
+
+
+@pytest.fixture(autouse=True)
+def connections(mocker):
+    are_connected = mocker.patch('herdcats.tube.are_connected')
+    are_connected.side_effect = lambda station1, station2: (
+        abs(station1 - station2) == 1)
+    return are_connected
+
+
+def _get_owners_and_cats():
+    return [
+        {
+            'owner': [1, 5, 7],
+            'cat': [5, 4, 7]
+        },
+        {
+            'owner': [2, 5, 7, 12],
+            'cat': [5, 4, 5, 3]
+        },
+        {
+            'owner': [1, 2, 3, 4],
+            'cat': [6, 7, 3, 4]
+        }
+    ]
+
+
+def _record_journeys(owners_and_cats):
+    """Returns an accumulator fed each pair's journey a move at a time."""
+    starts = [
+        {
+            'owner': owner_and_cat['owner'][:1],
+            'cat': owner_and_cat['cat'][:1],
+        }
+        for owner_and_cat in owners_and_cats
+    ]
+    accumulator = streaming.create(starts)
+    for i, owner_and_cat in enumerate(owners_and_cats):
+        journey = starts[i]
+        turns = len(owner_and_cat['owner'])
+        for turn in xrange(1, turns):
+            journey['owner'].append(owner_and_cat['owner'][turn])
+            if turn < len(owner_and_cat['cat']):
+                journey['cat'].append(owner_and_cat['cat'][turn])
+            is_found = (
+                turn == turns - 1 and
+                journey['owner'][-1] == journey['cat'][-1])
+            streaming.record(accumulator, i, journey, is_found)
+    return accumulator
+
+
+def test_get_total_cats():
+    accumulator = streaming.create(_get_owners_and_cats())
+
+    assert streaming.get_total_cats(accumulator) == 3
+
+
+def test_get_total_cats_found():
+    accumulator = _record_journeys(_get_owners_and_cats())
+
+    assert streaming.get_total_cats_found(accumulator) == 2
+
+
+def test_get_total_unreachable():
+    owners_and_cats = _get_owners_and_cats()
+    owners_and_cats[1]['unreachable'] = True
+    accumulator = streaming.create(owners_and_cats)
+    streaming.record_unreachable(accumulator)
+
+    assert streaming.get_total_unreachable(accumulator) == 2
+
+
+def test_get_average_turns_to_find_cat():
+    accumulator = _record_journeys(_get_owners_and_cats())
+
+    assert streaming.get_average_turns_to_find_cat(accumulator) == 3.5
+
+
+def test_get_average_turns_to_find_cat_raises_exception_if_none_found():
+    accumulator = streaming.create([])
+    with pytest.raises(ValueError):
+        streaming.get_average_turns_to_find_cat(accumulator)
+
+
+def test_station_visits_counted_as_players_move():
+    owners_and_cats = _get_owners_and_cats()
+
+    accumulator = _record_journeys(owners_and_cats)
+
+    assert accumulator['station_visits'] == Counter(
+        s for p in owners_and_cats for s in p['owner'] + p['cat'])
+
+
+def test_get_most_visited_station(mocker):
+    mocker.patch('herdcats.tube.get_station_name').side_effect = str
+    accumulator = _record_journeys(_get_owners_and_cats())
+
+    assert streaming.get_most_visited_station(accumulator) == '5'
+
+
+def test_get_most_visited_station_is_None_if_no_visits():
+    assert streaming.get_most_visited_station(streaming.create([])) is None
+
+
+def test_one_hop_counts_match_whole_journeys():
+    owners_and_cats = _get_owners_and_cats()
+
+    accumulator = _record_journeys(owners_and_cats)
+
+    assert list(accumulator['one_hop_counts']) == [
+        metrics.players.get_number_of_times_owner_one_hop_away(p)
+        for p in owners_and_cats
+    ]
+
+
+def test_one_hop_not_counted_once_cat_stops_moving():
+    owners_and_cats = [{'owner': [1, 3, 5, 7], 'cat': [4, 6]}]
+
+    accumulator = _record_journeys(owners_and_cats)
+
+    assert list(accumulator['one_hop_counts']) == [0]
+
+
+def test_get_least_lucky_owner():
+    accumulator = streaming.create([])
+    accumulator['one_hop_counts'].extend([1, 3, 3, 2])
+
+    assert streaming.get_least_lucky_owner(accumulator) == 1
+
+
+def test_create_counts_journeys_so_far():
+    owners_and_cats = _get_owners_and_cats()
+
+    accumulator = streaming.create(owners_and_cats)
+
+    assert streaming.get_total_cats_found(accumulator) == 2
+    assert accumulator['station_visits'][5] == 5
+    assert list(accumulator['owner_lengths']) == [3, 4, 4]
+    assert list(accumulator['cat_lengths']) == [3, 4, 4]
+
+
+def test_get_most_common_picks_lowest_key_on_a_tie():
+    assert streaming.get_most_common(Counter('cbbac')) == 'b'
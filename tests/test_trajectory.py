@@ -0,0 +1,76 @@
+import pytest
+
+from herdcats import trajectory
+
+from . import utils
+
+
+@pytest.fixture(autouse=True)
+def graph(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+
+def _create(stations, history='full'):
+    journey = trajectory.create(stations[0], history)
+    for station in stations[1:]:
+        journey.append(station)
+    return journey
+
+
+def test_full_history_keeps_every_station():
+    journey = _create([3, 1, 4, 2, 1, 2])
+
+    assert list(journey) == [3, 1, 4, 2, 1, 2]
+    assert len(journey) == 6
+
+
+def test_full_history_packs_connections_into_bits():
+    # 4 stations connected to at most 3 others need 2 bits a move
+    journey = _create([1, 2, 1, 3, 1, 4, 1, 2, 4])
+
+    assert len(journey._moves) == 2
+
+
+def test_full_history_of_first_connections():
+    journey = _create([1, 2, 1, 2, 1, 2, 1, 4])
+
+    assert list(journey) == [1, 2, 1, 2, 1, 2, 1, 4]
+
+
+def test_history_window_keeps_last_stations():
+    journey = _create([3, 1, 4, 2], history=2)
+
+    assert list(journey) == [4, 2]
+    assert len(journey) == 4
+
+
+def test_no_history_keeps_current_station():
+    journey = _create([3, 1, 4, 2], history='none')
+
+    assert list(journey) == [2]
+    assert len(journey) == 4
+
+
+def test_get_station():
+    journey = _create([3, 1, 4, 2], history=2)
+
+    assert journey[-1] == 2
+    assert journey[2] == 4
+    assert journey[-2] == 4
+    with pytest.raises(IndexError):
+        journey[1]
+
+
+def test_trajectories_behave_like_lists():
+    journey = _create([3, 1, 4])
+
+    assert journey == [3, 1, 4]
+    assert journey != [3, 1]
+    assert journey + [5] == [3, 1, 4, 5]
+    assert [5] + journey == [5, 3, 1, 4]
+
+
+def test_parse_history():
+    assert trajectory.parse_history('full') == 'full'
+    assert trajectory.parse_history('none') == 'none'
+    assert trajectory.parse_history('10') == 10
@@ -1,125 +1,301 @@
+from array import array
+from collections import Counter
+
+import pytest
+
+from herdcats import generators
+from herdcats import network
+from herdcats import randomness
 from herdcats import tube
 
 from . import utils
 
 
 def test_get_station_name(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
     assert tube.get_station_name(1) == 'foo'
 
 
+def _get_choices(mocker, choose):
+    """Returns every station choose(rng) picks for the values rng gives."""
+    rng = mocker.Mock()
+    rng.randbelow.return_value = 0
+    if choose(rng) is None:
+        return set()
+    number = rng.randbelow.call_args[0][0]
+    choices = set()
+    for i in xrange(number):
+        rng.randbelow.return_value = i
+        choices.add(choose(rng))
+    return choices
+
+
 def test_get_random_station_with_no_exclusions(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    rng = mocker.Mock()
+    rng.choice.side_effect = lambda stations: stations
 
-    random_station = tube.get_random_station()
+    random_station = tube.get_random_station(rng=rng)
 
     assert set(random_station) == set([1, 2, 3, 4])
 
 
 def test_get_random_station_excludes_exclusions(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    rng = mocker.Mock()
+    rng.choice.side_effect = [1, 2, 4]
+
+    random_station = tube.get_random_station(exclude=[1, 2], rng=rng)
+
+    assert random_station == 4
+
+
+def test_get_random_station_when_all_might_be_excluded(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    rng = mocker.Mock()
+    rng.choice.side_effect = lambda stations: stations
+
+    random_station = tube.get_random_station(exclude=[1, 2, 4, 5], rng=rng)
 
-    random_station = tube.get_random_station(exclude=[1, 2])
+    assert random_station == [3]
 
-    assert set(random_station) == set([3, 4])
+
+def test_random_station_pairs_keep_cats_from_their_owners(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    owners, cats = tube.get_random_station_pairs(
+        1000, rng=randomness.create(1))
+
+    assert len(owners) == len(cats) == 1000
+    assert set(owners) == set(cats) == set([1, 2, 3, 4])
+    assert all(owner != cat for owner, cat in zip(owners, cats))
+
+
+def test_random_station_pairs_need_two_stations(mocker):
+    graph = network.from_edges([], [], station_ids=[1], names=['One'])
+    mocker.patch('herdcats.tube.GRAPH', graph)
+
+    with pytest.raises(ValueError):
+        tube.get_random_station_pairs(1, rng=randomness.create(1))
 
 
 def test_get_random_connection_returns_valid_connection(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
-    connection = tube.get_random_connection(1)
+    connections = _get_choices(
+        mocker, lambda rng: tube.get_random_connection(1, rng=rng))
 
-    assert set(connection) == set([2, 3, 4])
+    assert connections == set([2, 3, 4])
 
 
 def test_get_random_connection_returns_None_if_station_closed(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
-    tube.STATIONS[1]['is_closed'] = True
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    rng = mocker.Mock()
+    tube.close_station(1)
 
-    connection = tube.get_random_connection(1)
+    connection = tube.get_random_connection(1, rng=rng)
 
     assert connection is None
+    rng.randbelow.assert_not_called()
 
 
 def test_get_random_connection_excludes_closed_stations(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
-    tube.STATIONS[3]['is_closed'] = True
-    tube.STATIONS[4]['is_closed'] = True
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    tube.close_station(3)
+    tube.close_station(4)
 
-    connection = tube.get_random_connection(1)
+    connections = _get_choices(
+        mocker, lambda rng: tube.get_random_connection(1, rng=rng))
 
-    assert connection == [2]
+    assert connections == set([2])
 
 
 def test_get_random_connection_excludes_exclusions_if_possible(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
-    connection = tube.get_random_connection(1, exclude_if_possible=[2, 4])
+    connections = _get_choices(mocker, lambda rng: tube.get_random_connection(
+        1, exclude_if_possible=[2, 4], rng=rng))
 
-    assert connection == [3]
+    assert connections == set([3])
 
 
 def test_get_random_connection_ignores_exclusions_if_theyd_prevent_travel(
         mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
-    mocker.patch('random.choice').side_effect = lambda stations: stations
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    connections = _get_choices(mocker, lambda rng: tube.get_random_connection(
+        1, exclude_if_possible=[2, 3, 4], rng=rng))
+
+    assert connections == set([2, 3, 4])
+
+
+def test_get_random_connection_is_uniform_over_possible_connections(
+        mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    rng = randomness.create(1)
 
-    connection = tube.get_random_connection(1, exclude_if_possible=[2, 3, 4])
+    counts = Counter(
+        tube.get_random_connection(1, exclude_if_possible=[3], rng=rng)
+        for __ in xrange(6000))
 
-    assert set(connection) == set([2, 3, 4])
+    assert set(counts) == set([2, 4])
+    assert abs(counts[2] - counts[4]) < 300
 
 
 def test_are_connected_when_true(mocker):
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
     assert tube.are_connected(1, 2)
 
 
 def test_are_connected_when_false(mocker):
-    mocker.patch('herdcats.tube.CONNECTIONS', utils.get_connections())
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
     assert not tube.are_connected(3, 4)
 
 
+def test_are_connected_both_ways(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    assert [tube.are_connected(4, station) for station in (1, 2, 3, 4)] == [
+        True, True, False, False]
+    assert tube.are_connected(2, 4)
+
+
 def test_close_station(mocker):
-    mocker.patch('herdcats.tube.STATIONS', utils.get_stations())
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
 
     tube.close_station(1)
 
-    assert tube.STATIONS[1]['is_closed']
+    assert tube.GRAPH['closed'][0]
 
 
 def test_lazy_load_loads_data_on_first_call(mocker):
-    mocker.patch('herdcats.tube.STATIONS', None)
-    mocker.patch('herdcats.tube.CONNECTIONS', None)
-    load_stations = mocker.patch('herdcats.tube._load_stations')
-    load_connections = mocker.patch('herdcats.tube._load_connections')
+    mocker.patch('herdcats.tube.GRAPH', None)
+    load_graph = mocker.patch('herdcats.tube._load_graph')
     func = mocker.Mock()
     decorated_func = tube._lazy_load_data(func)
 
     decorated_func()
 
-    load_stations.assert_called_once_with()
-    load_connections.assert_called_once_with()
+    load_graph.assert_called_once_with()
+    assert tube.GRAPH is load_graph.return_value
+
+
+def test_graph_compiled_and_saved_if_not_already(mocker):
+    mocker.patch('herdcats.tube._hash_files').return_value = 'digest'
+    mocker.patch('herdcats.tube._read_graph').return_value = None
+    load_stations = mocker.patch('herdcats.tube._load_stations')
+    load_connections = mocker.patch('herdcats.tube._load_connections')
+    build_graph = mocker.patch('herdcats.tube._build_graph')
+    write_graph = mocker.patch('herdcats.tube._write_graph')
+
+    graph = tube._load_graph()
+
+    build_graph.assert_called_once_with(
+        load_stations.return_value, load_connections.return_value)
+    assert graph is build_graph.return_value
+    write_graph.assert_called_once_with(
+        tube._get_data_path('tfl.graph'), 'digest', graph)
+
+
+def test_saved_graph_used_if_data_unchanged(mocker):
+    mocker.patch('herdcats.tube._hash_files').return_value = 'digest'
+    read_graph = mocker.patch('herdcats.tube._read_graph')
+    build_graph = mocker.patch('herdcats.tube._build_graph')
+
+    graph = tube._load_graph()
+
+    read_graph.assert_called_once_with(
+        tube._get_data_path('tfl.graph'), 'digest')
+    assert graph is read_graph.return_value
+    build_graph.assert_not_called()
+
+
+def test_saved_graph_read_back(tmpdir):
+    graph = utils.get_graph()
+    graph_path = str(tmpdir.join('test.graph'))
+    tube._write_graph(graph_path, 'a' * 32, graph)
+
+    assert tube._read_graph(graph_path, 'a' * 32) == graph
+
+
+def test_saved_graph_ignored_if_data_changed(tmpdir):
+    graph_path = str(tmpdir.join('test.graph'))
+    tube._write_graph(graph_path, 'a' * 32, utils.get_graph())
+
+    assert tube._read_graph(graph_path, 'b' * 32) is None
+
+
+def test_saved_graph_ignored_if_missing_or_truncated(tmpdir):
+    graph_path = str(tmpdir.join('test.graph'))
+    assert tube._read_graph(graph_path, 'a' * 32) is None
+    tube._write_graph(graph_path, 'a' * 32, utils.get_graph())
+    tmpdir.join('test.graph').write(
+        tmpdir.join('test.graph').read('rb')[:-1], 'wb')
+
+    assert tube._read_graph(graph_path, 'a' * 32) is None
+
+
+def test_graph_not_saved_if_directory_not_writable(tmpdir):
+    graph_path = str(tmpdir.join('missing', 'test.graph'))
+
+    tube._write_graph(graph_path, 'a' * 32, utils.get_graph())
+
+    assert not tmpdir.join('missing').check()
+
+
+def test_hash_of_data_files_changes_with_them(tmpdir):
+    tmpdir.join('tfl_stations.csv').write('1,foo\n')
+    tmpdir.join('tfl_connections.csv').write('1,2\n')
+    paths = [str(tmpdir.join('tfl_stations.csv')),
+             str(tmpdir.join('tfl_connections.csv'))]
+    digest = tube._hash_files(paths)
+    tmpdir.join('tfl_connections.csv').write('1,3\n')
+
+    assert len(digest) == 32
+    assert tube._hash_files(paths) != digest
+
+
+def test_hash_of_data_files_is_found_chunk_by_chunk(mocker, tmpdir):
+    tmpdir.join('tfl_connections.csv').write('1,2\n1,3\n')
+    paths = [str(tmpdir.join('tfl_connections.csv'))]
+    digest = tube._hash_files(paths)
+    mocker.patch('herdcats.tube._HASH_CHUNK_SIZE', 3)
+
+    assert tube._hash_files(paths) == digest
+
+
+def test_large_maps_look_station_ids_up_in_ids(mocker):
+    mocker.patch('herdcats.tube.INDEX_DICT_LIMIT', 2)
+    dense = tube._index_ids(array('i', [3, 4, 5]))
+    sparse = tube._index_ids(array('i', [3, 7, 9]))
+
+    assert [dense[3], dense[5], sparse[7], sparse[9]] == [0, 2, 1, 2]
+    assert len(dense) == 3
+    assert 6 not in dense and 4 not in sparse and 9 in sparse
+    with pytest.raises(KeyError):
+        sparse[8]
+    assert dense == tube._index_ids(array('i', [3, 4, 5]))
+    assert dense != sparse
+
+
+def test_set_graph(mocker):
+    mocker.patch('herdcats.tube.GRAPH', None)
+    graph = utils.get_graph()
+
+    tube.set_graph(graph)
+
+    assert tube.GRAPH is graph
+    assert tube.get_number_of_stations() == 4
+    assert tube.get_number_of_connections() == 4
 
 
 def test_lazy_load_doesnt_load_data_on_subsequent_calls(mocker):
     load_stations = mocker.patch('herdcats.tube._load_stations')
     load_connections = mocker.patch('herdcats.tube._load_connections')
-    mocker.patch('herdcats.tube.STATIONS', {})
-    mocker.patch('herdcats.tube.CONNECTIONS', {})
+    mocker.patch('herdcats.tube.GRAPH', {})
     func = mocker.Mock()
     decorated_func = tube._lazy_load_data(func)
 
@@ -157,3 +333,195 @@ def test_load_connections(monkeypatch):
         3: [1],
         4: [1, 2]
     })
+
+
+def test_load_connections_drops_duplicate_connections(monkeypatch):
+    utils.patch_open(monkeypatch, """\
+    1,2
+    2,1
+    1,2
+    1,3
+    """)
+    connections = tube._load_connections()
+    assert (connections == {
+        1: [2, 3],
+        2: [1],
+        3: [1],
+    })
+
+
+def test_build_graph_indexes_stations_in_id_order():
+    graph = tube._build_graph(
+        {
+            7: {'name': 'foo', 'is_closed': False},
+            3: {'name': 'bar', 'is_closed': False},
+        },
+        {3: [7], 7: [3]}
+    )
+
+    assert list(graph['ids']) == [3, 7]
+    assert graph['index'] == {3: 0, 7: 1}
+    assert graph['names'] == 'barfoo'
+    assert list(graph['name_offsets']) == [0, 3, 6]
+
+
+def test_build_graph_stores_connections_by_station(mocker):
+    graph = utils.get_graph()
+
+    assert list(graph['offsets']) == [0, 3, 5, 6, 8]
+    assert list(graph['neighbors']) == [1, 2, 3, 0, 3, 0, 0, 1]
+    assert list(graph['open_degree']) == [3, 2, 1, 2]
+
+
+def test_build_graph_drops_duplicate_connections_and_loops():
+    graph = tube._build_graph(
+        {
+            1: {'name': 'foo', 'is_closed': False},
+            2: {'name': 'bar', 'is_closed': False},
+        },
+        {1: [2, 2, 1], 2: [1, 1]}
+    )
+
+    assert list(graph['neighbors']) == [1, 0]
+
+
+def test_build_graph_closes_closed_stations():
+    stations = utils.get_stations()
+    stations[1]['is_closed'] = True
+
+    graph = tube._build_graph(stations, utils.get_connections())
+
+    assert list(graph['closed']) == [1, 0, 0, 0]
+    assert list(graph['open_degree']) == [0, 1, 0, 1]
+
+
+def test_closed_station_removed_from_neighbors_open_connections(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    tube.close_station(2)
+
+    offsets = tube.GRAPH['offsets']
+    open_neighbors = tube.GRAPH['open_neighbors']
+    open_degree = tube.GRAPH['open_degree']
+    assert open_degree[0] == 2
+    assert set(open_neighbors[offsets[0]:offsets[0] + 2]) == set([2, 3])
+    assert open_degree[3] == 1
+    assert open_neighbors[offsets[3]] == 0
+
+
+def test_closing_station_twice_has_no_further_effect(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    tube.close_station(2)
+    tube.close_station(2)
+
+    assert list(tube.GRAPH['open_degree']) == [2, 0, 1, 1]
+
+
+def test_get_connection_index(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    assert tube.get_connection_index(1, 4) == 2
+    assert tube.get_connection_index(4, 2) == 1
+
+
+def test_follow_connections_reverses_get_connection_index(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    assert list(tube.follow_connections(3, [0, 2, 1, 0])) == [1, 4, 2, 1]
+
+
+def test_get_max_connections(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    assert tube.get_max_connections() == 3
+
+
+def test_reopen_stations(mocker):
+    graph = utils.get_graph()
+    mocker.patch('herdcats.tube.GRAPH', graph)
+    tube.close_station(1)
+    tube.close_station(4)
+
+    tube.reopen_stations()
+
+    assert graph == utils.get_graph()
+
+
+def test_is_closed(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    tube.close_station(2)
+
+    assert tube.is_closed(2)
+    assert not tube.is_closed(1)
+
+
+def test_can_meet_in_same_part_of_network(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+
+    assert tube.can_meet(2, 3)
+    assert tube.can_meet(3, 3)
+
+
+def test_cant_meet_at_or_across_closed_stations(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    tube.can_meet(2, 3)
+    tube.close_station(1)
+
+    assert not tube.can_meet(1, 2)
+    # baz is cut off from bar and qux
+    assert not tube.can_meet(3, 2)
+
+
+def test_cant_meet_on_different_sides_of_two_sided_part(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    tube.close_station(3)
+    tube.close_station(4)
+
+    # foo and bar swap with each other every move
+    assert not tube.can_meet(1, 2)
+
+
+def test_part_becomes_two_sided_when_its_odd_cycle_closes(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    assert tube.can_meet(1, 2)
+
+    tube.close_station(4)
+
+    # foo, bar and qux made a triangle, leaving foo on the other side from
+    # bar and baz
+    assert not tube.can_meet(1, 2)
+    assert tube.can_meet(2, 3)
+
+
+def test_parts_of_network_kept_up_to_date_as_stations_close(mocker):
+    graph = generators.grid(25, randomness.create(0))
+    mocker.patch('herdcats.tube.GRAPH', graph)
+    tube.can_meet(0, 1)
+    for station in (7, 11, 13, 17, 0, 3, 21):
+        tube.close_station(station)
+        updated = graph['connectivity']
+        graph['connectivity'] = None
+        parts = tube._get_connectivity(graph)['component']
+        graph['connectivity'] = updated
+        labels = dict(zip(updated['component'], parts))
+        assert [labels[label] for label in updated['component']] == (
+            list(parts))
+        assert len(set(labels.values())) == len(labels)
+
+    # The middle of the grid and its top left are cut off
+    assert not tube.can_meet(12, 6)
+    assert not tube.can_meet(6, 24)
+    assert tube.can_meet(4, 24)
+    assert not tube.can_meet(4, 23)
+
+
+def test_reopening_stations_forgets_parts_of_network(mocker):
+    graph = utils.get_graph()
+    mocker.patch('herdcats.tube.GRAPH', graph)
+    tube.close_station(1)
+    assert not tube.can_meet(2, 3)
+
+    tube.reopen_stations()
+
+    assert tube.can_meet(2, 3)
@@ -0,0 +1,268 @@
+import pytest
+
+from herdcats import streaming
+from herdcats import vectorized
+
+from . import utils
+
+numpy = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def network(mocker):
+    mocker.patch('herdcats.tube.GRAPH', utils.get_graph())
+    return vectorized._load_network()
+
+
+def _create_state(network, owner, cat):
+    state = dict(
+        network,
+        rng=numpy.random.RandomState(0),
+        owner=numpy.array(owner),
+        cat=numpy.array(cat),
+        owner_start=numpy.array(owner),
+        cat_start=numpy.array(cat),
+        owner_moves=numpy.zeros(len(owner), dtype=int),
+        cat_moves=numpy.zeros(len(owner), dtype=int),
+        found=numpy.zeros(len(owner), dtype=bool),
+        unreachable=numpy.zeros(len(owner), dtype=bool),
+        visited=numpy.zeros((len(owner), 1), dtype=numpy.uint8),
+        history='full',
+        owner_history=[],
+        cat_history=[],
+    )
+    vectorized._mark_visited(state, _pairs(state), state['owner'])
+    return state
+
+
+def _pairs(state):
+    return numpy.arange(len(state['owner']))
+
+
+def test_N_owners_and_cats_are_created(network, mocker):
+    mocker.patch('herdcats.vectorized._load_network').return_value = network
+
+    state = vectorized.create(50)
+
+    assert len(state['owner']) == len(state['cat']) == 50
+    assert (state['owner'] != state['cat']).all()
+
+
+def test_load_network_indexes_stations_in_id_order(network):
+    assert network['station_ids'].tolist() == [1, 2, 3, 4]
+    assert network['open_degree'].tolist() == [3, 2, 1, 2]
+
+
+def test_close_station_removes_it_from_open_neighbors(network):
+    vectorized._close_station(network, 0)
+
+    assert network['open_degree'].tolist() == [0, 1, 0, 1]
+    assert network['open_neighbors'][1].tolist()[:1] == [3]
+    assert network['open_neighbors'][3].tolist()[:1] == [1]
+
+
+def test_players_move_to_connected_stations(network):
+    state = _create_state(network, [0] * 20, [1] * 20)
+    state['rng'] = numpy.random.RandomState(1)
+
+    next_stations, moved = vectorized._get_random_connections(
+        state, state['cat'])
+
+    assert moved.all()
+    assert set(next_stations.tolist()) == set([0, 3])
+
+
+def test_players_dont_move_from_closed_stations(network):
+    state = _create_state(network, [0], [1])
+    vectorized._close_station(state, 0)
+
+    next_stations, moved = vectorized._get_random_connections(
+        state, numpy.array([0]))
+
+    assert not moved.any()
+    assert next_stations.tolist() == [0]
+
+
+def test_players_dont_move_to_closed_stations(network):
+    state = _create_state(network, [0] * 20, [1] * 20)
+    vectorized._close_station(state, 2)
+    vectorized._close_station(state, 3)
+
+    next_stations, __ = vectorized._get_random_connections(
+        state, state['owner'])
+
+    assert next_stations.tolist() == [1] * 20
+
+
+def test_owners_avoid_visited_stations_if_possible(network):
+    state = _create_state(network, [0] * 20, [1] * 20)
+    vectorized._mark_visited(state, _pairs(state), numpy.array([1] * 20))
+    vectorized._mark_visited(state, _pairs(state), numpy.array([3] * 20))
+
+    next_stations, __ = vectorized._get_random_connections(
+        state, state['owner'], visited_by=_pairs(state))
+
+    assert next_stations.tolist() == [2] * 20
+
+
+def test_owners_revisit_stations_if_no_other_choice(network):
+    state = _create_state(network, [2] * 20, [1] * 20)
+
+    next_stations, moved = vectorized._get_random_connections(
+        state, state['owner'], visited_by=_pairs(state))
+
+    assert moved.all()
+    assert next_stations.tolist() == [0] * 20
+
+
+def test_station_is_closed_and_reported_when_cat_found(network, mocker):
+    report = mocker.patch('herdcats.events.found_cat')
+    close_station = mocker.patch('herdcats.tube.close_station')
+    # Owner at baz can only travel to foo, where the cat is stuck
+    state = _create_state(network, [2], [0])
+    state['open_degree'][0] = 0
+
+    searching = vectorized.move(state, 1)
+
+    assert not len(searching)
+    assert state['closed'][0]
+    assert state['found'].tolist() == [True]
+    assert vectorized.are_all_cats_found(state)
+    close_station.assert_called_once_with(1)
+    report.assert_called_once_with(0, 1)
+
+
+def test_found_pairs_stop_moving(network, mocker):
+    mocker.patch('herdcats.events.found_cat')
+    mocker.patch('herdcats.tube.close_station')
+    state = _create_state(network, [2, 1], [0, 3])
+    state['found'][0] = True
+
+    vectorized.move(state, 1)
+
+    assert state['owner'][0] == 2
+    assert state['owner_moves'].tolist() == [0, 1]
+
+
+def test_move_returns_owners_still_searching(network, mocker):
+    mocker.patch('herdcats.events.found_cat')
+    mocker.patch('herdcats.tube.close_station')
+    state = _create_state(network, [2, 2, 1], [0, 0, 3])
+    state['open_degree'][0] = 0
+
+    searching = vectorized.move(state, 1, numpy.array([1, 2]))
+
+    assert searching.tolist() == [2]
+    assert state['found'].tolist() == [False, True, False]
+
+
+def test_owners_who_cant_reach_their_cat_are_retired(network, mocker):
+    mocker.patch('herdcats.events.found_cat')
+    # Owner 0 finds their cat at foo, which leaves owner 1 at bar and their
+    # cat at qux swapping between them
+    state = _create_state(network, [2, 1, 3], [0, 3, 3])
+    state['open_degree'][[0, 1, 3]] = 0
+    state['found'][2] = True
+
+    searching = vectorized.move(state, 1, numpy.array([0, 1]))
+
+    assert not len(searching)
+    assert state['unreachable'].tolist() == [False, True, False]
+    assert vectorized.get_owners_and_cats(state)[1]['unreachable']
+
+
+def test_get_owners_and_cats_rebuilds_paths(network):
+    state = _create_state(network, [0, 1], [2, 3])
+    vectorized._record_moves(
+        state, 'owner', numpy.array([0, 1]), numpy.array([1, 3]),
+        numpy.array([True, True]))
+    vectorized._record_moves(
+        state, 'owner', numpy.array([0, 1]), numpy.array([3, 3]),
+        numpy.array([True, False]))
+    vectorized._record_moves(
+        state, 'cat', numpy.array([1]), numpy.array([1]),
+        numpy.array([True]))
+
+    assert vectorized.get_owners_and_cats(state) == [
+        {'owner': [1, 2, 4], 'cat': [3]},
+        {'owner': [2, 4], 'cat': [4, 2]},
+    ]
+
+
+def test_moves_are_kept_as_packed_connections(network):
+    state = _create_state(network, [0, 1, 2], [1, 2, 3])
+
+    vectorized._record_moves(
+        state, 'owner', _pairs(state), numpy.array([3, 0, 2]),
+        numpy.array([True, True, False]))
+
+    __, moved, connections = state['owner_history'][0]
+    # Two bits for each of the two moves, the third owner didn't move
+    assert numpy.unpackbits(moved)[:3].tolist() == [1, 1, 0]
+    assert vectorized._unpack(connections, 2, 2).tolist() == [2, 0]
+
+
+def test_last_stations_are_kept_with_history_window(network, mocker):
+    mocker.patch('herdcats.vectorized._load_network').return_value = network
+    state = vectorized.create(2, history=2)
+    state['owner'][:] = state['owner_trail'][:, 0] = [0, 1]
+    moved = numpy.array([True, False])
+
+    vectorized._record_moves(
+        state, 'owner', _pairs(state), numpy.array([1, 1]), moved)
+    vectorized._record_moves(
+        state, 'owner', _pairs(state), numpy.array([3, 1]), moved)
+
+    paths = vectorized._get_paths(state, 'owner')
+    assert paths == [[2, 4], [2]]
+    assert 'owner_history' not in state
+
+
+def test_only_current_station_is_kept_without_history(network, mocker):
+    mocker.patch('herdcats.vectorized._load_network').return_value = network
+    state = vectorized.create(2, history='none')
+
+    vectorized._record_moves(
+        state, 'owner', _pairs(state), numpy.array([1, 3]),
+        numpy.array([True, True]))
+
+    assert vectorized._get_paths(state, 'owner') == [[2], [4]]
+
+
+def test_owners_avoid_stations_in_visited_window(network):
+    state = _create_state(network, [0] * 20, [1] * 20)
+    del state['visited']
+    state['recent'] = numpy.array([[1, 3]] * 20)
+
+    next_stations, __ = vectorized._get_random_connections(
+        state, state['owner'], visited_by=_pairs(state))
+
+    assert next_stations.tolist() == [2] * 20
+
+
+def test_visited_window_overwrites_oldest_station(network):
+    state = _create_state(network, [0], [1])
+    del state['visited']
+    state['recent'] = numpy.array([[0, 1]])
+    state['owner_moves'][0] = 2
+
+    vectorized._mark_visited(state, numpy.array([0]), numpy.array([3]))
+
+    assert state['recent'].tolist() == [[3, 1]]
+
+
+def test_accumulator_matches_metrics_of_whole_journeys(network, mocker):
+    mocker.patch('herdcats.vectorized._load_network').return_value = network
+    mocker.patch('herdcats.events.found_cat')
+    state = vectorized.create(30)
+    accumulator = vectorized.create_accumulator(state)
+    searching = vectorized.get_searching(state)
+    for turn in xrange(1, 20):
+        searching = vectorized.move(
+            state, turn, searching, accumulator=accumulator)
+
+    expected = streaming.create(vectorized.get_owners_and_cats(state))
+    for key in ('total_found', 'total_turns_to_find', 'station_visits'):
+        assert accumulator[key] == expected[key]
+    for key in ('one_hop_counts', 'owner_lengths', 'cat_lengths'):
+        assert list(accumulator[key]) == list(expected[key])
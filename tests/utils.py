@@ -2,6 +2,8 @@ import contextlib
 import textwrap
 from cStringIO import StringIO
 
+from herdcats import tube
+
 
 def patch_open(monkeypatch, file_contents):
     @contextlib.contextmanager
@@ -26,3 +28,7 @@ def get_connections():
         3: [1],
         4: [1, 2]
     }
+
+
+def get_graph():
+    return tube._build_graph(get_stations(), get_connections())